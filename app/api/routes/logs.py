@@ -3,18 +3,38 @@ Log streaming API routes
 """
 
 import asyncio
-import json
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
+import orjson
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from sse_starlette.sse import EventSourceResponse
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
 
 from app.services.process_service import process_manager
 
 router = APIRouter()
 
+# SSE event names
+_EVENT_INFO = "info"
+_EVENT_LOG = "log"
+_EVENT_ERROR = "error"
+
+# Log payloads have a fixed shape; only the message needs JSON escaping
+# (ISO-8601 timestamps never contain characters that need it)
+_LOG_PAYLOAD_TEMPLATE = b'{"timestamp":"%s","message":%s}'
+
+# Static events are built once at import time
+_NO_SERVER_RUNNING = ServerSentEvent(
+    event=_EVENT_INFO,
+    data=orjson.dumps({"message": "No server is currently running"}).decode(),
+)
+_SERVER_STARTED = ServerSentEvent(
+    event=_EVENT_INFO,
+    data=orjson.dumps({"message": "Server started, beginning log stream"}).decode(),
+)
+
 
 @router.get("/stream")
 async def stream_logs():
@@ -25,36 +45,26 @@ async def stream_logs():
         try:
             # Stream logs from the currently running server
             if not process_manager.is_any_server_running():
-                yield {
-                    "event": "info",
-                    "data": json.dumps({"message": "No server is currently running"}),
-                }
+                yield _NO_SERVER_RUNNING
                 # Wait for a server to start
                 while not process_manager.is_any_server_running():
                     await asyncio.sleep(1)
-                yield {
-                    "event": "info",
-                    "data": json.dumps(
-                        {"message": "Server started, beginning log stream"}
-                    ),
-                }
+                yield _SERVER_STARTED
 
             async for log_entry in process_manager.get_current_server_logs():
-                yield {
-                    "event": "log",
-                    "data": json.dumps(
-                        {
-                            "timestamp": log_entry["timestamp"].isoformat(),
-                            "message": log_entry["message"],
-                        }
-                    ),
-                }
+                payload = _LOG_PAYLOAD_TEMPLATE % (
+                    datetime.fromtimestamp(log_entry["timestamp"]).isoformat().encode(),
+                    orjson.dumps(log_entry["message"]),
+                )
+                yield ServerSentEvent(event=_EVENT_LOG, data=payload.decode())
+                # Let the transport flush each event instead of coalescing bursts
+                await asyncio.sleep(0)
 
         except Exception as e:
-            yield {
-                "event": "error",
-                "data": json.dumps({"error": f"Log streaming error: {str(e)}"}),
-            }
+            yield ServerSentEvent(
+                event=_EVENT_ERROR,
+                data=orjson.dumps({"error": f"Log streaming error: {str(e)}"}).decode(),
+            )
 
     return EventSourceResponse(log_generator())
 
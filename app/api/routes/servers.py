@@ -4,10 +4,13 @@ Server management API routes (scoped to subscriptions)
 
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, HTTPException
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
 
+from app.core.cache import TTLCache
 from app.database.tinydb_manager import DatabaseManager
-from app.dependencies import get_database
+from app.dependencies import get_global_database
 from app.models.schemas import (
     AllocatedPort,
     ServerStartResponse,
@@ -20,14 +23,23 @@ from app.services.process_service import process_manager
 
 router = APIRouter()
 
+# Short-lived cache so bursts of UI status polls share one computation
+_STATUS_CACHE_KEY = "status"
+_status_cache = TTLCache(ttl=1.0)
+process_manager.add_state_listener(lambda: _status_cache.pop(_STATUS_CACHE_KEY))
+
+# URL-test SSE event names
+_EVENT_RESULT = "result"
+_EVENT_DONE = "done"
+_EVENT_ERROR = "error"
+
 
 @router.post(
     "/{subscription_id}/servers/{server_id}/start", response_model=ServerStartResponse
 )
-async def start_server(
-    subscription_id: UUID, server_id: UUID, db: DatabaseManager = Depends(get_database)
-):
+async def start_server(subscription_id: UUID, server_id: UUID):
     """Start a specific server"""
+    db = get_global_database()
     try:
         server = db.get_server(subscription_id, server_id)
 
@@ -99,10 +111,12 @@ async def start_server(
 
 # Simplified single server endpoints (no server_id needed)
 @router.post("/server/stop", response_model=ServerStopResponse)
-async def stop_current_server(db: DatabaseManager = Depends(get_database)):
+async def stop_current_server():
     """Stop the currently running server"""
+    db = get_global_database()
     try:
-        if not process_manager.is_any_server_running():
+        snapshot = process_manager.snapshot()
+        if not snapshot.is_running:
             return ServerStopResponse(
                 success=True,
                 message="No server is currently running",
@@ -110,17 +124,12 @@ async def stop_current_server(db: DatabaseManager = Depends(get_database)):
                 status="stopped",
             )
 
-        current_server_id = process_manager.get_current_server_id()
+        current_server_id = snapshot.server_id
         success = await process_manager.stop_current_server()
 
         if success and current_server_id:
-            # Find and update the server status in database
-            subscriptions = db.get_all_subscriptions()
-            for subscription in subscriptions:
-                for server in subscription.servers:
-                    if server.id == current_server_id:
-                        db.update_server_status(subscription.id, server.id, "stopped")
-                        break
+            # Update the server status in database
+            db.find_and_update_server_status(current_server_id, "stopped")
 
             return ServerStopResponse(
                 success=True,
@@ -137,74 +146,83 @@ async def stop_current_server(db: DatabaseManager = Depends(get_database)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@router.get("/server/status", response_model=ServerStatusResponse)
-async def get_current_server_status(db: DatabaseManager = Depends(get_database)):
-    """Get status of the currently running server"""
-    try:
-        if not process_manager.is_any_server_running():
-            return ServerStatusResponse(
-                success=True,
-                message="No server is currently running",
-                server_id=None,
-                status="stopped",
-                remarks=None,
-                process_id=None,
-                start_time=None,
-                allocated_ports=None,
-            )
-
-        current_server_id = process_manager.get_current_server_id()
-        current_info = process_manager.get_current_server_info()
-        port_info = process_manager.get_current_server_port_info()
-        allocated_ports = [
-            AllocatedPort(port=port["port"], protocol=port["protocol"], tag=port["tag"])
-            for port in port_info
-        ]
-
-        if not current_info:
-            return ServerStatusResponse(
-                success=True,
-                message="Server status unknown",
-                server_id=current_server_id,
-                status="unknown",
-                remarks=None,
-                process_id=None,
-                start_time=None,
-                allocated_ports=None,
-            )
+def _build_current_server_status(db: DatabaseManager) -> ServerStatusResponse:
+    """Build the status response for the currently running server"""
+    snapshot = process_manager.snapshot()
+    if not snapshot.is_running:
+        return ServerStatusResponse(
+            success=True,
+            message="No server is currently running",
+            server_id=None,
+            status="stopped",
+            remarks=None,
+            process_id=None,
+            start_time=None,
+            allocated_ports=None,
+        )
 
-        # Get server details from database
-        server_remarks = "Unknown"
-        subscriptions = db.get_all_subscriptions()
-        for subscription in subscriptions:
-            for server in subscription.servers:
-                if server.id == current_server_id:
-                    server_remarks = server.remarks
-                    # Update status to running if needed
-                    if server.status != "running":
-                        db.update_server_status(subscription.id, server.id, "running")
-                    break
+    current_server_id = snapshot.server_id
+    current_info = snapshot.info
+    # Port info comes from our own process state, so skip validation
+    allocated_ports = [
+        AllocatedPort.model_construct(port=port, protocol=protocol, tag=tag)
+        for port, protocol, tag in snapshot.port_info
+    ]
 
+    if not current_info:
         return ServerStatusResponse(
             success=True,
-            message="Server is running",
+            message="Server status unknown",
             server_id=current_server_id,
-            status="running",
-            remarks=server_remarks,
-            process_id=current_info.process_id,
-            start_time=current_info.start_time.isoformat(),
-            allocated_ports=allocated_ports,
+            status="unknown",
+            remarks=None,
+            process_id=None,
+            start_time=None,
+            allocated_ports=None,
         )
 
+    # Get server details from database
+    server_remarks = "Unknown"
+    location = db.get_server_location(current_server_id)
+    if location:
+        _, server = location
+        server_remarks = server.remarks
+        # Update status to running if needed
+        if server.status != "running":
+            db.find_and_update_server_status(server.id, "running")
+
+    return ServerStatusResponse(
+        success=True,
+        message="Server is running",
+        server_id=current_server_id,
+        status="running",
+        remarks=server_remarks,
+        process_id=current_info.process_id,
+        start_time=current_info.start_time.isoformat(),
+        allocated_ports=allocated_ports,
+    )
+
+
+@router.get("/server/status", response_model=ServerStatusResponse)
+async def get_current_server_status():
+    """Get status of the currently running server"""
+    cached = _status_cache.get(_STATUS_CACHE_KEY)
+    if cached is not None:
+        return cached
+
+    try:
+        status = _build_current_server_status(get_global_database())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+    _status_cache.set(_STATUS_CACHE_KEY, status)
+    return status
+
 
 @router.post("/{subscription_id}/url-test", response_model=SubscriptionUrlTestResponse)
-async def test_subscription_servers(
-    subscription_id: UUID, db: DatabaseManager = Depends(get_database)
-):
+async def test_subscription_servers(subscription_id: UUID):
     """Test all servers in a subscription by starting them on random ports and checking connectivity"""
+    db = get_global_database()
     try:
         subscription = db.get_subscription(subscription_id)
 
@@ -232,27 +250,13 @@ async def test_subscription_servers(
             subscription.servers, subscription_id, test_timeout=5
         )
 
-        # Convert results to response models
-        server_test_results = []
-        successful_tests = 0
-        failed_tests = 0
-
-        for result in test_results:
-            server_result = ServerTestResult(
-                server_id=result["server_id"],
-                remarks=result["remarks"],
-                success=result["success"],
-                ping_ms=result["ping_ms"],
-                error=result["error"],
-                socks_port=result["socks_port"],
-                http_port=result["http_port"],
-            )
-            server_test_results.append(server_result)
-
-            if result["success"]:
-                successful_tests += 1
-            else:
-                failed_tests += 1
+        # Result dicts are built by the process manager with matching field
+        # names and types, so skip re-validation
+        server_test_results = [
+            ServerTestResult.model_construct(**result) for result in test_results
+        ]
+        successful_tests = sum(1 for result in test_results if result["success"])
+        failed_tests = len(test_results) - successful_tests
 
         return SubscriptionUrlTestResponse(
             success=True,
@@ -269,3 +273,56 @@ async def test_subscription_servers(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/{subscription_id}/url-test/stream")
+async def stream_subscription_server_tests(subscription_id: UUID):
+    """Test all servers in a subscription, streaming each result via Server-Sent Events"""
+    db = get_global_database()
+    try:
+        subscription = db.get_subscription(subscription_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    if not subscription:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+
+    async def result_generator():
+        """Generate test result events"""
+        successful_tests = 0
+        failed_tests = 0
+        try:
+            # Stop any currently running server to free resources
+            if process_manager.is_any_server_running():
+                await process_manager.stop_current_server()
+
+            async for result in process_manager.iter_subscription_server_tests(
+                subscription.servers, subscription_id, test_timeout=5
+            ):
+                if result["success"]:
+                    successful_tests += 1
+                else:
+                    failed_tests += 1
+                yield ServerSentEvent(
+                    event=_EVENT_RESULT, data=orjson.dumps(result).decode()
+                )
+
+            yield ServerSentEvent(
+                event=_EVENT_DONE,
+                data=orjson.dumps(
+                    {
+                        "subscription_id": subscription_id,
+                        "total_servers": len(subscription.servers),
+                        "successful_tests": successful_tests,
+                        "failed_tests": failed_tests,
+                    }
+                ).decode(),
+            )
+
+        except Exception as e:
+            yield ServerSentEvent(
+                event=_EVENT_ERROR,
+                data=orjson.dumps({"error": f"URL test error: {str(e)}"}).decode(),
+            )
+
+    return EventSourceResponse(result_generator())
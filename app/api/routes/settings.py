@@ -4,10 +4,9 @@ Settings management API routes
 
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
 
-from app.database.tinydb_manager import DatabaseManager
-from app.dependencies import get_database
+from app.dependencies import get_global_database
 from app.models.database import SettingsModel
 from app.models.schemas import SettingsResponse, SettingsUpdate, SettingsUpdateResponse
 from app.services.process_service import process_manager
@@ -15,65 +14,17 @@ from app.services.process_service import process_manager
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-
-async def restart_current_server_if_running():
-    """Restart the currently running server if any"""
-    try:
-        if process_manager.current_server_id and process_manager.is_server_running(
-            process_manager.current_server_id
-        ):
-            logger.info(
-                f"Restarting server {process_manager.current_server_id} after settings update"
-            )
-
-            # Get the current server info to restart it with the same configuration
-            server_info = process_manager.running_processes.get(
-                process_manager.current_server_id
-            )
-            if server_info:
-                # Stop the current server
-                await process_manager.stop_server(process_manager.current_server_id)
-
-                # Restart with the same configuration
-                success, error_msg = await process_manager.start_single_server(
-                    server_info.server_id,
-                    server_info.subscription_id,
-                    server_info.config,
-                )
-
-                if success:
-                    logger.info(
-                        f"Successfully restarted server {process_manager.current_server_id}"
-                    )
-                    return True
-                else:
-                    logger.error(
-                        f"Failed to restart server {process_manager.current_server_id}: {error_msg}"
-                    )
-                    return False
-            else:
-                logger.warning(
-                    f"Could not find server info for {process_manager.current_server_id}"
-                )
-        return False
-    except Exception as e:
-        logger.error(f"Failed to restart server: {e}")
-        return False
+# Settings that only take effect after the running xray process is restarted
+XRAY_RESTART_FIELDS = ("xray_binary", "xray_assets_folder", "xray_log_level")
 
 
 @router.get("", response_model=SettingsResponse)
-async def get_settings(db: DatabaseManager = Depends(get_database)):
+async def get_settings():
     """Get current global settings"""
+    db = get_global_database()
     try:
-        settings = db.get_settings()
-
-        return SettingsResponse(
-            socks_port=settings.socks_port,
-            http_port=settings.http_port,
-            xray_binary=settings.xray_binary,
-            xray_assets_folder=settings.xray_assets_folder,
-            xray_log_level=settings.xray_log_level,
-        )
+        # SettingsResponse is the stored SettingsModel, so return it directly
+        return await db.aget_settings()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -81,9 +32,14 @@ async def get_settings(db: DatabaseManager = Depends(get_database)):
 
 @router.put("", response_model=SettingsUpdateResponse)
 async def update_settings(
-    settings_update: SettingsUpdate, db: DatabaseManager = Depends(get_database)
+    settings_update: SettingsUpdate,
+    background_tasks: BackgroundTasks,
+    wait: bool = Query(
+        False, description="Wait for the running server to restart before responding"
+    ),
 ):
     """Update global settings (e.g., change default SOCKS/HTTP ports)"""
+    db = get_global_database()
     try:
         if (
             settings_update.socks_port is not None
@@ -94,11 +50,27 @@ async def update_settings(
                 status_code=400, detail="SOCKS and HTTP ports cannot be the same"
             )
 
-        db.update_settings(SettingsModel.model_validate(settings_update.model_dump()))
+        current_settings = await db.aget_settings()
+        new_settings = SettingsModel.model_validate(settings_update.model_dump())
+        if new_settings != current_settings:
+            db.update_settings(new_settings)
 
-        await restart_current_server_if_running()
+        updated_settings = await db.aget_settings()
 
-        updated_settings = db.get_settings()
+        # Only restart xray when a setting it depends on actually changed
+        restart_scheduled = False
+        if process_manager.snapshot().is_running and any(
+            getattr(current_settings, field) != getattr(updated_settings, field)
+            for field in XRAY_RESTART_FIELDS
+        ):
+            if wait:
+                await process_manager.restart_running_server("settings update")
+            else:
+                # Restarting xray takes seconds, so do it after responding
+                background_tasks.add_task(
+                    process_manager.restart_running_server, "settings update"
+                )
+                restart_scheduled = True
 
         return SettingsUpdateResponse(
             success=True,
@@ -108,6 +80,7 @@ async def update_settings(
             xray_binary=updated_settings.xray_binary,
             xray_assets_folder=updated_settings.xray_assets_folder,
             xray_log_level=updated_settings.xray_log_level,
+            restart_scheduled=restart_scheduled,
         )
 
     except HTTPException:
@@ -2,12 +2,14 @@
 Subscription management API routes
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
-from app.database.tinydb_manager import DatabaseManager
+from app.database.tinydb_manager import DatabaseManager, NotFoundError
 from app.dependencies import get_database
 from app.models.schemas import (
     SubscriptionCreate,
@@ -18,28 +20,36 @@ from app.models.schemas import (
     SubscriptionServersUpdateResponse,
     SubscriptionUpdate,
     SubscriptionUpdateResponse,
-    SubscriptionUserInfoResponse,
 )
 from app.services.subscription_service import SubscriptionService
 
 router = APIRouter()
 
 
-def get_subscription_service():
-    """Get subscription service instance"""
-    return SubscriptionService()
-
-
-def _convert_user_info_to_response(user_info) -> Optional[SubscriptionUserInfoResponse]:
-    """Convert database user info to response model"""
-    if not user_info:
-        return None
-
-    return SubscriptionUserInfoResponse(
-        used_traffic=user_info.used_traffic,
-        total=user_info.total,
-        expire=user_info.expire,
-    )
+def get_subscription_service(request: Request) -> SubscriptionService:
+    """Get the app-wide subscription service instance"""
+    return request.app.state.subscription_service
+
+
+def _subscription_summary(subscription) -> Dict[str, Any]:
+    """Build the SubscriptionResponse payload for a stored subscription"""
+    user_info = subscription.user_info
+    return {
+        "id": subscription.id,
+        "name": subscription.name,
+        "url": subscription.url,
+        "last_updated": subscription.last_updated,
+        "server_count": len(subscription.servers),
+        "user_info": (
+            {
+                "used_traffic": user_info.used_traffic,
+                "total": user_info.total,
+                "expire": user_info.expire,
+            }
+            if user_info
+            else None
+        ),
+    }
 
 
 @router.post("", response_model=SubscriptionCreateResponse)
@@ -73,33 +83,47 @@ async def create_subscription(
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        await service.close()
 
 
-@router.get("", response_model=List[SubscriptionResponse])
+# Read endpoints serialize stored models directly; the response models only
+# document the payload shape, skipping a second validation pass
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": List[SubscriptionResponse]}},
+)
 async def list_subscriptions(db: DatabaseManager = Depends(get_database)):
     """List all subscriptions"""
     try:
         subscriptions = db.get_all_subscriptions()
 
-        return [
-            SubscriptionResponse(
-                id=sub.id,
-                name=sub.name,
-                url=sub.url,
-                last_updated=sub.last_updated,
-                server_count=len(sub.servers),
-                user_info=_convert_user_info_to_response(sub.user_info),
-            )
-            for sub in subscriptions
-        ]
+        return ORJSONResponse([_subscription_summary(sub) for sub in subscriptions])
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+
+@router.get("/ndjson")
+async def stream_subscriptions(db: DatabaseManager = Depends(get_database)):
+    """List all subscriptions as newline-delimited JSON, one per line"""
+    try:
+        subscriptions = db.get_all_subscriptions()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+    async def subscription_lines():
+        """Generate one JSON line per subscription"""
+        for sub in subscriptions:
+            yield orjson.dumps(_subscription_summary(sub)) + b"\n"
+
+    return StreamingResponse(subscription_lines(), media_type="application/x-ndjson")
+
 
-@router.get("/{subscription_id}", response_model=SubscriptionDetailResponse)
+@router.get(
+    "/{subscription_id}",
+    response_model=None,
+    responses={200: {"model": SubscriptionDetailResponse}},
+)
 async def get_subscription(
     subscription_id: UUID, db: DatabaseManager = Depends(get_database)
 ):
@@ -110,18 +134,12 @@ async def get_subscription(
         if not subscription:
             raise HTTPException(status_code=404, detail="Subscription not found")
 
-        return SubscriptionDetailResponse(
-            id=subscription.id,
-            name=subscription.name,
-            url=subscription.url,
-            last_updated=subscription.last_updated,
-            server_count=len(subscription.servers),
-            user_info=_convert_user_info_to_response(subscription.user_info),
-            servers=[
-                {"id": server.id, "remarks": server.remarks, "status": server.status}
-                for server in subscription.servers
-            ],
-        )
+        detail = _subscription_summary(subscription)
+        detail["servers"] = [
+            {"id": server.id, "remarks": server.remarks, "status": server.status}
+            for server in subscription.servers
+        ]
+        return ORJSONResponse(detail)
 
     except HTTPException:
         raise
@@ -138,11 +156,6 @@ async def update_subscription(
 ):
     """Update subscription details"""
     try:
-        subscription = db.get_subscription(subscription_id)
-
-        if not subscription:
-            raise HTTPException(status_code=404, detail="Subscription not found")
-
         # Prepare updates
         update_data = {}
         if updates.name is not None:
@@ -153,6 +166,18 @@ async def update_subscription(
             normalized_url = service._normalize_url(str(updates.url))
             update_data["url"] = normalized_url
 
+        # Nothing to change, so skip the write and last_updated bump
+        if not update_data:
+            subscription = db.get_subscription(subscription_id)
+            if not subscription:
+                raise HTTPException(status_code=404, detail="Subscription not found")
+            return SubscriptionUpdateResponse(
+                success=True,
+                message="No changes",
+                id=subscription.id,
+                name=subscription.name,
+            )
+
         # Update subscription
         updated_subscription = db.update_subscription(subscription_id, update_data)
 
@@ -165,10 +190,10 @@ async def update_subscription(
 
     except HTTPException:
         raise
+    except NotFoundError:
+        raise HTTPException(status_code=404, detail="Subscription not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        await service.close()
 
 
 @router.delete("/{subscription_id}", response_model=SubscriptionDeleteResponse)
@@ -228,10 +253,13 @@ async def update_subscription_servers(
         )
 
         # Save updated servers and user info to database
+        # Store the same timestamp the response reports
+        last_updated = updated_subscription.last_updated.isoformat()
         db.update_subscription_with_user_info(
             subscription_id,
             updated_subscription.servers,
             updated_subscription.user_info,
+            now_iso=last_updated,
         )
 
         return SubscriptionServersUpdateResponse(
@@ -239,7 +267,7 @@ async def update_subscription_servers(
             message=f"Subscription '{subscription.name}' updated successfully",
             id=subscription_id,
             server_count=len(updated_subscription.servers),
-            last_updated=updated_subscription.last_updated.isoformat(),
+            last_updated=last_updated,
         )
 
     except HTTPException:
@@ -248,5 +276,3 @@ async def update_subscription_servers(
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        await service.close()
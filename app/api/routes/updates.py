@@ -2,75 +2,37 @@
 Xray and geodata update API routes
 """
 
+import asyncio
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
 from app.models.schemas import (
     GeodataUpdateResponse,
+    XrayAssetInfo,
     XrayUpdateRequest,
     XrayUpdateResponse,
     XrayVersionInfo,
 )
 from app.services.process_service import process_manager
-from app.services.xray_update_service import GeodataUpdateService, XrayUpdateService
+from app.services.xray_update_service import (
+    GeodataUpdateService,
+    XrayInstallResult,
+    XrayUpdateService,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-def get_xray_update_service():
-    """Get Xray update service instance"""
-    return XrayUpdateService()
-
-
-def get_geodata_update_service():
-    """Get geodata update service instance"""
-    return GeodataUpdateService()
-
+def get_xray_update_service(request: Request) -> XrayUpdateService:
+    """Get the app-wide Xray update service instance"""
+    return request.app.state.xray_update_service
 
-async def restart_current_server_if_running():
-    """Restart the currently running server if any"""
-    try:
-        if process_manager.current_server_id and process_manager.is_server_running(
-            process_manager.current_server_id
-        ):
-            logger.info(
-                f"Restarting server {process_manager.current_server_id} after update"
-            )
-
-            # Get the current server info to restart it with the same configuration
-            server_info = process_manager.running_processes.get(
-                process_manager.current_server_id
-            )
-            if server_info:
-                # Stop the current server
-                await process_manager.stop_server(process_manager.current_server_id)
-
-                # Restart with the same configuration
-                success, error_msg = await process_manager.start_single_server(
-                    server_info.server_id,
-                    server_info.subscription_id,
-                    server_info.config,
-                )
 
-                if success:
-                    logger.info(
-                        f"Successfully restarted server {process_manager.current_server_id}"
-                    )
-                else:
-                    logger.error(
-                        f"Failed to restart server {process_manager.current_server_id}: {error_msg}"
-                    )
-                return True
-            else:
-                logger.warning(
-                    f"Could not find server info for {process_manager.current_server_id}"
-                )
-        return False
-    except Exception as e:
-        logger.error(f"Failed to restart server: {e}")
-        return False
+def get_geodata_update_service(request: Request) -> GeodataUpdateService:
+    """Get the app-wide geodata update service instance"""
+    return request.app.state.geodata_update_service
 
 
 @router.get("/xray/info", response_model=XrayVersionInfo)
@@ -79,21 +41,22 @@ async def get_xray_version_info(
 ):
     """Get current and available Xray version information"""
     try:
-        # Get version information
-        xray_info = await process_manager.check_xray_availability()
+        # Get version information; the lookups are independent, so run them
+        # concurrently (available versions and sizes come from a single API call)
+        xray_info, latest_version, version_sizes = await asyncio.gather(
+            process_manager.check_xray_availability(),
+            service.get_latest_version(),
+            service.get_available_versions_with_sizes(limit=10),
+        )
         current_version = xray_info.get("version")
-        latest_version = await service.get_latest_version()
-
-        # Get available versions with sizes in a single API call
-        version_sizes = await service.get_available_versions_with_sizes(limit=10)
-        available_versions = list(version_sizes.keys())
 
+        # Built from our own parsed release data, so skip per-item validation
         version_items = [
-            {"version": ver, "size_bytes": version_sizes.get(ver)}
-            for ver in available_versions
+            XrayAssetInfo.model_construct(version=ver, size_bytes=size)
+            for ver, size in version_sizes.items()
         ]
 
-        return XrayVersionInfo(
+        return XrayVersionInfo.model_construct(
             current_version=current_version,
             latest_version=latest_version,
             available_versions=version_items,
@@ -112,8 +75,20 @@ async def update_xray(
 ):
     """Update Xray binary to specified version or latest"""
     try:
-        xray_info = await process_manager.check_xray_availability()
         xray_binary = process_manager.get_effective_xray_binary()
+
+        # Get the current version and the release info needed to pick the
+        # target version concurrently
+        if request.version:
+            xray_info, available_versions = await asyncio.gather(
+                process_manager.check_xray_availability(),
+                service.get_available_versions(limit=50),
+            )
+        else:
+            xray_info, latest_version = await asyncio.gather(
+                process_manager.check_xray_availability(),
+                service.get_latest_version(),
+            )
         # Get current version before update
         current_version = xray_info.get("version")
 
@@ -121,7 +96,6 @@ async def update_xray(
         if request.version:
             target_version = request.version
             # Validate that the version exists
-            available_versions = await service.get_available_versions(limit=50)
             if (
                 target_version not in available_versions
                 and f"v{target_version}" not in available_versions
@@ -130,7 +104,7 @@ async def update_xray(
                     status_code=400, detail=f"Version {target_version} is not available"
                 )
         else:
-            target_version = await service.get_latest_version()
+            target_version = latest_version
 
         # Check if we're already on the target version
         if current_version and current_version == target_version:
@@ -142,24 +116,30 @@ async def update_xray(
             )
 
         # Perform the update
-        success = await service.download_xray(target_version, xray_binary)
-
-        if success:
-            # Restart the currently running server if any
-            restarted = await restart_current_server_if_running()
-
-            message = f"Successfully updated Xray to version {target_version}"
-            if restarted:
-                message += " and restarted the running server"
+        result = await service.download_xray(target_version, xray_binary)
 
+        # The installed binary already came from this release, so nothing changed
+        if result is XrayInstallResult.ALREADY_INSTALLED:
             return XrayUpdateResponse(
                 success=True,
-                message=message,
+                message=f"Xray is already up to date (version {target_version})",
                 version=target_version,
                 current_version=current_version,
             )
-        else:
-            raise HTTPException(status_code=500, detail="Update failed")
+
+        # Restart the currently running server if any
+        restarted = await process_manager.restart_running_server("update")
+
+        message = f"Successfully updated Xray to version {target_version}"
+        if restarted:
+            message += " and restarted the running server"
+
+        return XrayUpdateResponse(
+            success=True,
+            message=message,
+            version=target_version,
+            current_version=current_version,
+        )
 
     except HTTPException:
         raise
@@ -195,7 +175,7 @@ async def update_geodata(
             message = "Successfully updated all geodata files"
 
             # Restart the currently running server if any
-            restarted = await restart_current_server_if_running()
+            restarted = await process_manager.restart_running_server("update")
             if restarted:
                 message += " and restarted the running server"
         else:
@@ -0,0 +1,38 @@
+"""
+Small in-memory caching helpers
+"""
+
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """In-memory key/value cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache a value for the configured TTL"""
+        self._entries[key] = (monotonic() + self.ttl, value)
+
+    def pop(self, key: Hashable) -> None:
+        """Drop a cached value if present"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all cached values"""
+        self._entries.clear()
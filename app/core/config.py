@@ -2,10 +2,9 @@
 Application configuration
 """
 
-import random
 from functools import lru_cache
 from pathlib import Path
-from socket import AF_INET, SO_REUSEADDR, SOCK_STREAM, SOL_SOCKET, socket
+from socket import AF_INET, SOCK_STREAM, socket
 
 from platformdirs import user_data_dir
 from pydantic_settings import BaseSettings
@@ -13,24 +12,18 @@ from pydantic_settings import BaseSettings
 
 def find_free_port():
     """
-    Find a random free 5-digit port (10000-65535).
+    Find a free 5-digit port (10000-65535) by letting the OS assign one.
     This works on Windows, macOS, and Linux.
     """
-    for _ in range(20):
-        port = random.randint(10000, 65535)
+    # Ephemeral port ranges are 5-digit on all major OSes by default; retry
+    # once in case a system is configured with a lower range
+    for _ in range(2):
         with socket(AF_INET, SOCK_STREAM) as s:
-            # SO_REUSEADDR is safe for port checking on all major OSes
-            s.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-            try:
-                s.bind(("", port))
-                return port
-            except OSError:
-                continue
-    # Fallback: let OS pick any free port
-    with socket(AF_INET, SOCK_STREAM) as s:
-        s.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        s.bind(("", 0))
-        return s.getsockname()[1]
+            s.bind(("", 0))
+            port = s.getsockname()[1]
+        if port >= 10000:
+            break
+    return port
 
 
 class Settings(BaseSettings):
@@ -0,0 +1,95 @@
+"""
+orjson-backed TinyDB storage
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import Storage
+
+
+class ORJSONStorage(Storage):
+    """Store TinyDB data in a JSON file, serialized with orjson"""
+
+    def __init__(self, path: str, indent: bool = False):
+        """Initialize the storage, creating the file if it doesn't exist"""
+        super().__init__()
+        self.path = path
+        self._option = orjson.OPT_INDENT_2 if indent else 0
+
+        if not os.path.exists(path):
+            open(path, "ab").close()
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Read the database state, or None if the file is empty"""
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        if not data:
+            # Empty file, so let TinyDB initialize the database
+            return None
+        return orjson.loads(data)
+
+    def write(self, data: Dict[str, Dict[str, Any]]):
+        """Write the database state atomically via a temporary file"""
+        self.write_bytes(self.dumps(data))
+
+    def dumps(self, data: Dict[str, Dict[str, Any]]) -> bytes:
+        """Serialize the database state"""
+        return orjson.dumps(data, option=self._option)
+
+    def write_bytes(self, content: bytes):
+        """Write serialized database state atomically via a temporary file"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class SnapshotCachingMiddleware(CachingMiddleware):
+    """CachingMiddleware whose flush can be split into snapshot and write
+
+    TinyDB mutates the cached data in place, so it may only be serialized
+    while the caller's lock is held. The slow file write and fsync can then
+    happen outside that lock with write_snapshot().
+    """
+
+    def __init__(self, storage_cls):
+        super().__init__(storage_cls)
+        self._write_lock = threading.Lock()
+        # Generation of the latest snapshot taken and of the one on disk
+        self._generation = 0
+        self._written_generation = 0
+
+    def snapshot(self) -> Optional[Tuple[int, bytes]]:
+        """Serialize unwritten changes, or return None if there are none"""
+        if self._cache_modified_count == 0:
+            return None
+        content = self.storage.dumps(self.cache)
+        self._cache_modified_count = 0
+        self._generation += 1
+        return self._generation, content
+
+    def write_snapshot(self, snapshot: Tuple[int, bytes]):
+        """Write a snapshot, unless a newer one has been written already"""
+        generation, content = snapshot
+        with self._write_lock:
+            if generation <= self._written_generation:
+                return
+            self.storage.write_bytes(content)
+            self._written_generation = generation
+
+    def mark_modified(self):
+        """Mark the cache as having unwritten changes (e.g. after a failed write)"""
+        self._cache_modified_count += 1
+
+    def flush(self):
+        """Flush all unwritten data to disk"""
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            self.write_snapshot(snapshot)
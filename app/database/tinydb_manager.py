@@ -2,23 +2,31 @@
 TinyDB database manager for persistent storage
 """
 
+import asyncio
 import os
 import platform
 import shutil
 import subprocess
 import threading
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 from platformdirs import user_data_dir
-from tinydb import Query, TinyDB
+from pydantic import BaseModel
+from tinydb import TinyDB
 
+from app.database.storage import ORJSONStorage, SnapshotCachingMiddleware
 from app.models.database import ServerModel, SettingsModel, SubscriptionModel
 
 
+class NotFoundError(LookupError):
+    """Raised when a requested record does not exist"""
+
+
 def check_xray_command_available() -> tuple[bool, str | None]:
     """
     Check if the 'xray' command is available on the system.
@@ -37,7 +45,8 @@ def check_xray_command_available() -> tuple[bool, str | None]:
             if platform.system() == "Windows":
                 kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
 
-            result = subprocess.run(["xray", "--version"], **kwargs)
+            # Run the resolved path so the PATH isn't searched a second time
+            result = subprocess.run([xray_path, "--version"], **kwargs)
             # Check if the output contains xray-core information
             is_xray_core = (
                 "xray-core" in result.stdout.lower() or "xray" in result.stdout.lower()
@@ -52,6 +61,22 @@ def check_xray_command_available() -> tuple[bool, str | None]:
         return False, None
 
 
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    """Parse a stored ISO timestamp, returning None if it is missing or invalid"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def ensure_dir(path: str):
+    """Create a directory once per process"""
+    os.makedirs(path, exist_ok=True)
+
+
 def get_xray_data_directory() -> Path:
     """
     Get the appropriate directory for storing xray binary and assets.
@@ -76,16 +101,28 @@ class DatabaseManager:
         """Initialize the database manager"""
         self.db_path = db_path
         self._lock = threading.RLock()  # Reentrant lock for thread safety
+        self._settings_cache: Optional[SettingsModel] = None
+        # TinyDB document ID of the single settings row, once it exists
+        self._settings_doc_id: Optional[int] = None
 
         # Ensure database directory exists
-        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        ensure_dir(os.path.dirname(os.path.abspath(db_path)))
 
-        self.db = TinyDB(db_path, indent=2)
+        # Writes are kept in memory and persisted by flush() / close()
+        self.db = TinyDB(db_path, storage=SnapshotCachingMiddleware(ORJSONStorage))
 
         # Get tables
         self.subscriptions_table = self.db.table("subscriptions")
         self.settings_table = self.db.table("settings")
 
+        # Map of subscription ID -> TinyDB document ID
+        self._id_index: Dict[str, int] = {}
+        # Map of subscription ID -> hydrated model (write-through)
+        self._sub_cache: Dict[str, SubscriptionModel] = {}
+        # Map of server ID -> (owning subscription ID, position in its servers)
+        self._server_index: Dict[UUID, Tuple[UUID, int]] = {}
+        self._build_indexes()
+
         # Initialize settings if not exists
         self._init_settings()
 
@@ -98,229 +135,276 @@ class DatabaseManager:
         finally:
             self._lock.release()
 
-    def _escape_json_path(self, path: str) -> str:
-        """Escape Windows path characters that can break JSON parsing"""
-        if not isinstance(path, str):
-            return path
-
-        # Replace backslashes with forward slashes for cross-platform compatibility
-        escaped_path = path.replace("\\", "/")
-
-        # Handle problematic characters that can break JSON
-        # Note: Python's json module handles most escaping automatically,
-        # but we normalize paths to prevent issues
-        return escaped_path
-
-    def _unescape_json_path(self, path: str) -> str:
-        """Unescape path for Windows compatibility"""
-        if not isinstance(path, str):
-            return path
-
-        # Convert forward slashes back to backslashes on Windows
-        if platform.system() == "Windows" and "/" in path and ":" in path:
-            return path.replace("/", "\\")
-
-        return path
+    def _build_indexes(self):
+        """Build the subscription cache and indexes from stored subscriptions"""
+        with self._db_operation():
+            self._id_index = {}
+            self._sub_cache = {}
+            self._server_index = {}
+            for doc in self.subscriptions_table.all():
+                subscription = self._hydrate(doc)
+                self._id_index[doc["id"]] = doc.doc_id
+                self._sub_cache[doc["id"]] = subscription
+                for position, server in enumerate(subscription.servers):
+                    self._server_index[server.id] = (subscription.id, position)
+
+    def _index_servers(self, subscription_id: UUID, servers: List[ServerModel]):
+        """Replace the indexed servers of a subscription"""
+        self._unindex_servers(subscription_id)
+        for position, server in enumerate(servers):
+            self._server_index[server.id] = (subscription_id, position)
+
+    def _unindex_servers(self, subscription_id: UUID):
+        """Drop all indexed servers of a subscription"""
+        self._server_index = {
+            server_id: location
+            for server_id, location in self._server_index.items()
+            if location[0] != subscription_id
+        }
 
     def _init_settings(self):
         """Ensure settings are initialized by delegating to get_settings()."""
         self.get_settings()
 
-    def _serialize_for_db(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Serialize data for database storage with Windows path safety"""
-        if isinstance(data, dict):
-            result = {}
-            for key, value in data.items():
-                if isinstance(value, UUID):
-                    result[key] = str(value)
-                elif isinstance(value, datetime):
-                    result[key] = value.isoformat()
-                elif isinstance(value, Path):
-                    # Convert Path to string and escape for JSON
-                    result[key] = self._escape_json_path(str(value))
-                elif isinstance(value, str) and key in [
-                    "xray_binary",
-                    "xray_assets_folder",
-                ]:
-                    # Escape path strings for JSON safety
-                    result[key] = self._escape_json_path(value)
-                elif isinstance(value, dict):
-                    result[key] = self._serialize_for_db(value)
-                elif isinstance(value, list):
-                    result[key] = [
-                        self._serialize_for_db(item) if isinstance(item, dict) else item
-                        for item in value
-                    ]
-                else:
-                    result[key] = value
-            return result
-        return data
+    def _to_db(self, model: BaseModel) -> Dict[str, Any]:
+        """Convert a model to a JSON-native dict for storage"""
+        return model.model_dump(mode="json")
 
     def _deserialize_from_db(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Deserialize data from database storage with Windows path handling"""
-        if isinstance(data, dict):
-            result = {}
-            for key, value in data.items():
-                if key in ["id"] and isinstance(value, str):
-                    try:
-                        result[key] = UUID(value)
-                    except ValueError:
-                        result[key] = value
-                elif key in ["last_updated"] and isinstance(value, str):
-                    try:
-                        result[key] = datetime.fromisoformat(value)
-                    except ValueError:
-                        result[key] = None
-                elif key in ["xray_binary", "xray_assets_folder"] and isinstance(
-                    value, str
-                ):
-                    # Unescape paths for Windows compatibility
-                    result[key] = self._unescape_json_path(value)
-                elif key == "user_info" and isinstance(value, dict):
-                    # Handle nested datetime in user_info.expire
-                    user_info_data = self._deserialize_from_db(value)
-                    if "expire" in user_info_data and isinstance(
-                        user_info_data["expire"], str
-                    ):
-                        try:
-                            user_info_data["expire"] = datetime.fromisoformat(
-                                user_info_data["expire"]
-                            )
-                        except ValueError:
-                            user_info_data["expire"] = None
-                    result[key] = user_info_data
-                elif isinstance(value, dict):
-                    result[key] = self._deserialize_from_db(value)
-                elif isinstance(value, list):
-                    result[key] = [
-                        self._deserialize_from_db(item)
-                        if isinstance(item, dict)
-                        else item
-                        for item in value
-                    ]
-                else:
-                    result[key] = value
-            return result
-        return data
+        """Prepare a stored subscription document for model validation
+
+        UUID and datetime strings are coerced by Pydantic; only timestamps that
+        fail to parse need mapping to None here.
+        """
+        result = dict(data)
+        result["last_updated"] = _parse_datetime(result.get("last_updated"))
+        user_info = result.get("user_info")
+        if isinstance(user_info, dict):
+            result["user_info"] = {
+                **user_info,
+                "expire": _parse_datetime(user_info.get("expire")),
+            }
+        return result
+
+    def _hydrate(self, doc: Dict[str, Any]) -> SubscriptionModel:
+        """Build a subscription model from a stored document"""
+        return SubscriptionModel.model_validate(self._deserialize_from_db(doc))
 
     # Subscription operations
     def create_subscription(self, subscription: SubscriptionModel) -> SubscriptionModel:
         """Create a new subscription"""
         with self._db_operation():
-            data = self._serialize_for_db(subscription.model_dump())
-            self.subscriptions_table.insert(data)
+            data = self._to_db(subscription)
+            doc_id = self.subscriptions_table.insert(data)
+            self._id_index[data["id"]] = doc_id
+            self._sub_cache[data["id"]] = subscription
+            self._index_servers(subscription.id, subscription.servers)
             return subscription
 
     def get_subscription(self, subscription_id: UUID) -> Optional[SubscriptionModel]:
         """Get a subscription by ID"""
         with self._db_operation():
-            query = Query()
-            result = self.subscriptions_table.search(query.id == str(subscription_id))
-            if result:
-                data = self._deserialize_from_db(result[0])
-                return SubscriptionModel(**data)
-            return None
+            return self._sub_cache.get(str(subscription_id))
 
     def get_all_subscriptions(self) -> List[SubscriptionModel]:
         """Get all subscriptions"""
         with self._db_operation():
-            results = self.subscriptions_table.all()
-            subscriptions = []
-            for result in results:
-                data = self._deserialize_from_db(result)
-                subscriptions.append(SubscriptionModel(**data))
-            return subscriptions
+            return list(self._sub_cache.values())
 
     def update_subscription(
-        self, subscription_id: UUID, updates: Dict[str, Any]
+        self,
+        subscription_id: UUID,
+        updates: Dict[str, Any],
+        now_iso: Optional[str] = None,
+    ) -> SubscriptionModel:
+        """Update a subscription with JSON-native field values
+
+        Raises:
+            NotFoundError: If the subscription does not exist
+        """
+        subscription = self._write_subscription_updates(
+            subscription_id, dict(updates), now_iso
+        )
+        if subscription is None:
+            raise NotFoundError(f"Subscription {subscription_id} not found")
+        return subscription
+
+    def _write_subscription_updates(
+        self,
+        subscription_id: UUID,
+        serialized_updates: Dict[str, Any],
+        now_iso: Optional[str] = None,
     ) -> Optional[SubscriptionModel]:
-        """Update a subscription"""
+        """Write already-serialized updates to a subscription
+
+        now_iso lets callers that already hold the update time reuse it as
+        last_updated instead of taking a new timestamp.
+        """
+        key = str(subscription_id)
         with self._db_operation():
-            query = Query()
-            serialized_updates = self._serialize_for_db(updates)
+            doc_id = self._id_index.get(key)
+            if doc_id is None:
+                return None
 
             # Add last_updated timestamp
             if "last_updated" not in serialized_updates:
-                serialized_updates["last_updated"] = datetime.now().isoformat()
+                serialized_updates["last_updated"] = (
+                    now_iso or datetime.now(timezone.utc).isoformat()
+                )
 
-            self.subscriptions_table.update(
-                serialized_updates, query.id == str(subscription_id)
-            )
-            return self.get_subscription(subscription_id)
+            self.subscriptions_table.update(serialized_updates, doc_ids=[doc_id])
+            subscription = self._hydrate(self.subscriptions_table.get(doc_id=doc_id))
+            self._sub_cache[key] = subscription
+            return subscription
 
     def delete_subscription(self, subscription_id: UUID) -> bool:
         """Delete a subscription"""
+        key = str(subscription_id)
         with self._db_operation():
-            query = Query()
-            result = self.subscriptions_table.remove(query.id == str(subscription_id))
+            doc_id = self._id_index.pop(key, None)
+            self._sub_cache.pop(key, None)
+            self._unindex_servers(subscription_id)
+            if doc_id is None:
+                return False
+            result = self.subscriptions_table.remove(doc_ids=[doc_id])
             return len(result) > 0
 
     def update_subscription_servers(
-        self, subscription_id: UUID, servers: List[ServerModel]
+        self,
+        subscription_id: UUID,
+        servers: List[ServerModel],
+        now_iso: Optional[str] = None,
     ) -> Optional[SubscriptionModel]:
         """Update servers for a subscription"""
-        serialized_servers = [
-            self._serialize_for_db(server.model_dump()) for server in servers
-        ]
-        updates = {
-            "servers": serialized_servers,
-            "last_updated": datetime.now().isoformat(),
-        }
-        return self.update_subscription(subscription_id, updates)
+        updates = {"servers": [self._to_db(server) for server in servers]}
+        with self._db_operation():
+            # Only index servers of a subscription that still exists, e.g. not
+            # one deleted while its servers were being fetched
+            subscription = self._write_subscription_updates(
+                subscription_id, updates, now_iso
+            )
+            if subscription is not None:
+                self._index_servers(subscription_id, servers)
+            return subscription
 
     def update_subscription_with_user_info(
-        self, subscription_id: UUID, servers: List[ServerModel], user_info
+        self,
+        subscription_id: UUID,
+        servers: List[ServerModel],
+        user_info,
+        now_iso: Optional[str] = None,
     ) -> Optional[SubscriptionModel]:
         """Update servers and user info for a subscription"""
-        serialized_servers = [
-            self._serialize_for_db(server.model_dump()) for server in servers
-        ]
-        updates = {
-            "servers": serialized_servers,
-            "last_updated": datetime.now().isoformat(),
-        }
+        updates = {"servers": [self._to_db(server) for server in servers]}
 
         # Add user_info if provided
         if user_info:
-            updates["user_info"] = self._serialize_for_db(user_info.model_dump())
+            updates["user_info"] = self._to_db(user_info)
 
-        return self.update_subscription(subscription_id, updates)
+        with self._db_operation():
+            # Only index servers of a subscription that still exists, e.g. not
+            # one deleted while its servers were being fetched
+            subscription = self._write_subscription_updates(
+                subscription_id, updates, now_iso
+            )
+            if subscription is not None:
+                self._index_servers(subscription_id, servers)
+            return subscription
 
     # Server operations (within subscriptions)
     def get_server(
         self, subscription_id: UUID, server_id: UUID
     ) -> Optional[ServerModel]:
         """Get a server by ID within a subscription"""
-        subscription = self.get_subscription(subscription_id)
-        if subscription:
-            for server in subscription.servers:
-                if server.id == server_id:
-                    return server
-        return None
+        with self._db_operation():
+            location = self._server_index.get(server_id)
+            if location is None or location[0] != subscription_id:
+                return None
+            subscription = self._sub_cache.get(str(subscription_id))
+            if subscription is None:
+                return None
+            return subscription.servers[location[1]]
+
+    def get_server_location(
+        self, server_id: UUID
+    ) -> Optional[Tuple[UUID, ServerModel]]:
+        """Find a server by ID across all subscriptions
+
+        Returns:
+            Optional[Tuple[UUID, ServerModel]]: (subscription_id, server)
+        """
+        with self._db_operation():
+            location = self._server_index.get(server_id)
+            if location is None:
+                return None
+            subscription_id, position = location
+            subscription = self._sub_cache.get(str(subscription_id))
+            if subscription is None:
+                return None
+            return subscription_id, subscription.servers[position]
+
+    def _set_server_status(
+        self, subscription_id: UUID, server_id: UUID, status: str
+    ) -> Optional[ServerModel]:
+        """Write one server's status in place and mirror it on the cached model"""
+        location = self._server_index.get(server_id)
+        if location is None or location[0] != subscription_id:
+            return None
+
+        key = str(subscription_id)
+        doc_id = self._id_index.get(key)
+        subscription = self._sub_cache.get(key)
+        if doc_id is None or subscription is None:
+            return None
+        # Cached servers are in the same order as the stored servers list
+        position = location[1]
+        server = subscription.servers[position]
+        now = datetime.now(timezone.utc)
+
+        def set_status(doc: Dict[str, Any]):
+            doc["servers"][position]["status"] = status
+            doc["last_updated"] = now.isoformat()
+
+        self.subscriptions_table.update(set_status, doc_ids=[doc_id])
+        server.status = status
+        subscription.last_updated = now
+        return server
 
     def update_server_status(
         self, subscription_id: UUID, server_id: UUID, status: str
     ) -> Optional[ServerModel]:
         """Update server status"""
         with self._db_operation():
-            subscription = self.get_subscription(subscription_id)
-            if subscription:
-                for i, server in enumerate(subscription.servers):
-                    if server.id == server_id:
-                        subscription.servers[i].status = status
-                        self.update_subscription_servers(
-                            subscription_id, subscription.servers
-                        )
-                        return subscription.servers[i]
-            return None
+            return self._set_server_status(subscription_id, server_id, status)
+
+    def find_and_update_server_status(self, server_id: UUID, status: str) -> bool:
+        """Update a server's status without knowing its subscription
+
+        Returns:
+            bool: Whether a matching server was found
+        """
+        with self._db_operation():
+            location = self._server_index.get(server_id)
+            if location is None:
+                return False
+            return self._set_server_status(location[0], server_id, status) is not None
 
     # Settings operations
     def get_settings(self) -> SettingsModel:
         """Get current settings"""
+        # Fast path: reading the cached reference is atomic, no lock needed
+        cached = self._settings_cache
+        if cached is not None:
+            return cached
+
         with self._db_operation():
+            if self._settings_cache is not None:
+                return self._settings_cache
+
             result = self.settings_table.all()
             if result:
-                settings = SettingsModel(**result[0])
+                self._settings_doc_id = result[0].doc_id
+                settings = SettingsModel.model_validate(result[0])
             else:
                 settings = SettingsModel()
 
@@ -331,7 +415,7 @@ class DatabaseManager:
                     settings.xray_assets_folder = settings.xray_assets_folder
                 else:
                     xray_data_dir = get_xray_data_directory()
-                    xray_data_dir.mkdir(parents=True, exist_ok=True)
+                    ensure_dir(str(xray_data_dir))
                     settings.xray_binary = str(
                         xray_data_dir / get_default_xray_binary_filename()
                     )
@@ -339,16 +423,51 @@ class DatabaseManager:
 
                 self.update_settings(settings)
 
+            self._settings_cache = settings
             return settings
 
+    async def aget_settings(self) -> SettingsModel:
+        """Get current settings without blocking the event loop"""
+        cached = self._settings_cache
+        if cached is not None:
+            return cached
+        # Resolving the settings may probe the xray binary in a subprocess
+        return await asyncio.to_thread(self.get_settings)
+
     def update_settings(self, settings: SettingsModel) -> SettingsModel:
         """Update settings"""
         with self._db_operation():
             data = settings.model_dump()
-            self.settings_table.truncate()  # Clear existing settings
-            self.settings_table.insert(data)
+            if self._settings_doc_id is None:
+                self._settings_doc_id = self.settings_table.insert(data)
+            else:
+                # The dump has every field, so this replaces the row in place
+                self.settings_table.update(data, doc_ids=[self._settings_doc_id])
+            # Settings without an xray binary are resolved again by get_settings()
+            self._settings_cache = settings if settings.xray_binary else None
             return settings
 
+    def flush(self):
+        """Write pending changes to disk
+
+        Only serializing the cached data holds the manager lock; the file write
+        and fsync run without it, so other operations aren't stalled on disk I/O.
+        """
+        storage = self.db.storage
+        with self._db_operation():
+            snapshot = storage.snapshot()
+        if snapshot is None:
+            return
+
+        try:
+            storage.write_snapshot(snapshot)
+        except Exception:
+            # Keep the changes pending so the next flush retries them
+            with self._db_operation():
+                storage.mark_modified()
+            raise
+
     def close(self):
-        """Close the database connection"""
-        self.db.close()
+        """Close the database connection (flushing pending changes)"""
+        with self._db_operation():
+            self.db.close()
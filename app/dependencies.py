@@ -2,20 +2,39 @@
 Shared FastAPI dependencies
 """
 
+import asyncio
+import atexit
+import logging
+import threading
+
 from app.core.config import get_settings
 from app.database.tinydb_manager import DatabaseManager
 
+logger = logging.getLogger(__name__)
+
 # Global database instance
 _global_db = None
+_global_db_lock = threading.Lock()
+
+# How often buffered database writes are persisted (seconds)
+DATABASE_FLUSH_INTERVAL = 5.0
 
 
 def get_global_database() -> DatabaseManager:
     """Get the global database instance (singleton)"""
     global _global_db
-    if _global_db is None:
-        settings = get_settings()
-        _global_db = DatabaseManager(settings.database_path)
-    return _global_db
+    db = _global_db
+    if db is not None:
+        return db
+
+    with _global_db_lock:
+        # Another thread may have created it while we waited for the lock
+        if _global_db is None:
+            settings = get_settings()
+            _global_db = DatabaseManager(settings.database_path)
+            # The desktop app can exit without running the ASGI shutdown
+            atexit.register(close_global_database)
+        return _global_db
 
 
 def get_database():
@@ -26,6 +45,22 @@ def get_database():
 def close_global_database():
     """Close the global database connection (called on app shutdown)"""
     global _global_db
-    if _global_db is not None:
-        _global_db.close()
-        _global_db = None
+    with _global_db_lock:
+        if _global_db is not None:
+            _global_db.close()
+            _global_db = None
+
+
+async def flush_global_database_periodically(
+    interval: float = DATABASE_FLUSH_INTERVAL,
+):
+    """Persist buffered database writes every interval seconds, off the event loop"""
+    while True:
+        await asyncio.sleep(interval)
+        db = _global_db
+        if db is None:
+            continue
+        try:
+            await asyncio.to_thread(db.flush)
+        except Exception as e:
+            logger.error(f"Failed to flush database: {e}")
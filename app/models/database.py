@@ -2,6 +2,7 @@
 Database models for TinyDB storage
 """
 
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, List, Optional
@@ -49,7 +50,9 @@ class SubscriptionModel(BaseModel):
 class SubscriptionUserInfo(BaseModel):
     """Subscription user info model for traffic and expiry data"""
 
-    used_traffic: int = Field(..., description="Total used traffic in bytes")
+    used_traffic: int = Field(
+        ..., description="Total used traffic (upload + download) in bytes"
+    )
     total: Optional[int] = Field(
         None, description="Total data limit in bytes (None if unlimited)"
     )
@@ -85,7 +88,8 @@ class SettingsModel(BaseModel):
     )
 
 
-class ProcessInfo(BaseModel):
+@dataclass(slots=True)
+class ProcessInfo:
     """Process information for running servers (not stored in database)"""
 
     server_id: UUID
@@ -93,11 +97,3 @@ class ProcessInfo(BaseModel):
     process_id: int
     start_time: datetime
     config: Dict[str, Any]
-
-    @field_serializer("server_id", "subscription_id")
-    def serialize_uuids(self, value: UUID) -> str:
-        return str(value)
-
-    @field_serializer("start_time")
-    def serialize_start_time(self, value: datetime) -> str:
-        return value.isoformat()
@@ -9,6 +9,8 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field, HttpUrl, field_validator, model_validator
 
+from app.models.database import SettingsModel, SubscriptionUserInfo
+
 
 class ServerStatus(str, Enum):
     STOPPED = "stopped"
@@ -26,18 +28,8 @@ class SubscriptionUpdate(BaseModel):
     url: Optional[HttpUrl] = Field(None, description="Subscription URL")
 
 
-class SubscriptionUserInfoResponse(BaseModel):
-    """Response model for subscription user info (traffic and expiry data)"""
-
-    used_traffic: int = Field(
-        ..., description="Total used traffic (upload + download) in bytes"
-    )
-    total: Optional[int] = Field(
-        None, description="Total data limit in bytes (None if unlimited)"
-    )
-    expire: Optional[datetime] = Field(
-        None, description="Expiry date (None if no expiry)"
-    )
+# Stored user info is returned as-is
+SubscriptionUserInfoResponse = SubscriptionUserInfo
 
 
 class ServerResponse(BaseModel):
@@ -67,25 +59,8 @@ class SubscriptionDetailResponse(SubscriptionResponse):
     )
 
 
-class SettingsResponse(BaseModel):
-    socks_port: Optional[int] = Field(None, description="Global SOCKS port override")
-    http_port: Optional[int] = Field(None, description="Global HTTP port override")
-    xray_binary: Optional[str] = Field(None, description="Path to xray binary")
-    xray_assets_folder: Optional[str] = Field(
-        None, description="Path to xray assets folder"
-    )
-
-    class XrayLogLevel(str, Enum):
-        DEBUG = "debug"
-        INFO = "info"
-        WARNING = "warning"
-        ERROR = "error"
-        NONE = "none"
-
-    xray_log_level: Optional[XrayLogLevel] = Field(
-        XrayLogLevel.WARNING,
-        description="Xray log level override (debug, info, warning, error, none)",
-    )
+# Stored settings are returned as-is
+SettingsResponse = SettingsModel
 
 
 class SettingsUpdate(BaseModel):
@@ -236,6 +211,9 @@ class SettingsUpdateResponse(BaseModel):
     xray_log_level: Optional[SettingsResponse.XrayLogLevel] = Field(
         None, description="Updated xray log level"
     )
+    restart_scheduled: bool = Field(
+        False, description="Whether a restart of the running server was scheduled"
+    )
 
 
 # URL Test response models
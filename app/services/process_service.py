@@ -3,37 +3,110 @@ Xray-core process management service
 """
 
 import asyncio
-import json
 import logging
 import os
 import platform
-from copy import deepcopy
+import re
+import subprocess
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
-from random import randint
 from shutil import which
 from socket import AF_INET, SOCK_STREAM, socket
 from time import time
-from typing import AsyncGenerator, Dict, List, Optional, Tuple
+from typing import AsyncGenerator, Callable, Deque, Dict, List, Optional, Tuple
 from uuid import UUID
 
+import orjson
 from httpx import AsyncClient, TimeoutException
 
 from app.core.config import get_settings
 from app.dependencies import get_global_database
-from app.models.database import ProcessInfo
+from app.models.database import ProcessInfo, SettingsModel
 
 logger = logging.getLogger(__name__)
 
-
-class UUIDEncoder(json.JSONEncoder):
-    """Custom JSON encoder that handles UUID objects"""
-
-    def default(self, obj):
-        if isinstance(obj, UUID):
-            return str(obj)
-        elif isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+# How long URL tests wait for xray to start listening, and how often they check
+PORT_READY_TIMEOUT = 2.0
+PORT_READY_POLL_INTERVAL = 0.025
+
+# Number of recent log lines kept per server; older lines are dropped
+LOG_BUFFER_SIZE = 1000
+
+_IS_WINDOWS = platform.system() == "Windows"
+# On Windows, hide the console window of spawned xray processes
+_CREATIONFLAGS = subprocess.CREATE_NO_WINDOW if _IS_WINDOWS else 0
+# Fallback xray location when it isn't configured or on PATH
+_DEFAULT_XRAY_BINARY = (
+    "C:\\Program Files\\Xray\\xray.exe" if _IS_WINDOWS else "/usr/bin/xray"
+)
+
+# Substrings of inbound tags that identify a protocol, checked in order
+_TAG_PROTOCOLS = (
+    ("socks", "socks"),
+    ("http", "http"),
+    ("trojan", "trojan"),
+    ("vless", "vless"),
+    ("vmess", "vmess"),
+    ("shadowsocks", "shadowsocks"),
+    ("ss", "shadowsocks"),
+)
+
+# Patterns for parsing `xray version` output
+_XRAY_VERSION_RE = re.compile(
+    r"^Xray\s+([0-9]+\.[0-9]+\.[0-9]+)[^\n]*?(?:\s+([0-9a-f]{7,}))?\s*\((go[0-9.]+)\s+([^\s)]+)\)"
+)
+_GO_VERSION_RE = re.compile(r"go version ([^\s]+)", re.IGNORECASE)
+_ARCH_RE = re.compile(r"(amd64|arm64|386|arm)")
+
+
+@dataclass(frozen=True)
+class CurrentServerSnapshot:
+    """Point-in-time view of the currently running server"""
+
+    is_running: bool
+    server_id: Optional[UUID] = None
+    info: Optional[ProcessInfo] = None
+    port_info: List[Tuple[int, str, Optional[str]]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ServerRuntime:
+    """Process handle, info and log buffer of a started server"""
+
+    info: ProcessInfo
+    process: asyncio.subprocess.Process
+    # Recent log lines, plus an event set when lines are added or logs close
+    log_buffer: Deque[Dict] = field(
+        default_factory=lambda: deque(maxlen=LOG_BUFFER_SIZE)
+    )
+    log_event: asyncio.Event = field(default_factory=asyncio.Event)
+    logs_closed: bool = False
+
+    def close_logs(self):
+        """Mark the logs as finished, waking log streams so they can end"""
+        self.logs_closed = True
+        self.log_event.set()
+
+
+# PATH value -> xray binary found on it. Only hits are cached, so an xray
+# installed after a failed lookup is picked up without a restart.
+_xray_on_path: Dict[str, str] = {}
+
+
+def _find_xray_on_path(path_env: str) -> Optional[str]:
+    """Find the xray binary on PATH (cached per PATH value once found)"""
+    cached = _xray_on_path.get(path_env)
+    if cached is not None and os.path.isfile(cached):
+        return cached
+
+    # Try both "xray" and "xray.exe" for better Windows compatibility
+    xray_path = which("xray", path=path_env) or which("xray.exe", path=path_env)
+    if xray_path:
+        _xray_on_path[path_env] = xray_path
+    else:
+        _xray_on_path.pop(path_env, None)
+    return xray_path
 
 
 class ProcessManager:
@@ -41,43 +114,54 @@ class ProcessManager:
 
     def __init__(self):
         self.settings = get_settings()
-        self.running_processes: Dict[UUID, ProcessInfo] = {}
-        self.process_handles: Dict[UUID, asyncio.subprocess.Process] = {}
-        self.log_queues: Dict[UUID, asyncio.Queue] = {}
+        self.servers: Dict[UUID, ServerRuntime] = {}
         self.current_server_id: Optional[UUID] = (
             None  # Track the currently running server
         )
+        self._state_listeners: List[Callable[[], None]] = []
+
+    def add_state_listener(self, listener: Callable[[], None]):
+        """Register a callback invoked whenever a server starts or stops"""
+        self._state_listeners.append(listener)
+
+    def _notify_state_change(self):
+        """Invoke all registered state listeners"""
+        for listener in self._state_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"State listener failed: {e}")
 
     @property
     def db(self):
         """Get the global database instance"""
         return get_global_database()
 
-    def get_effective_xray_binary(self) -> str:
+    def get_effective_xray_binary(
+        self, db_settings: Optional[SettingsModel] = None
+    ) -> str:
         """Get the effective xray binary path from database settings or system PATH"""
         try:
-            db_settings = self.db.get_settings()
+            if db_settings is None:
+                db_settings = self.db.get_settings()
             if db_settings.xray_binary:
                 return db_settings.xray_binary
         except Exception as e:
             logger.warning(f"Failed to get xray_binary from database settings: {e}")
 
-        # Try both "xray" and "xray.exe" for better Windows compatibility
-        xray_path = which("xray") or which("xray.exe")
+        xray_path = _find_xray_on_path(os.environ.get("PATH", os.defpath))
         if xray_path:
             return xray_path
 
-        if platform.system() == "Linux":
-            return "/usr/bin/xray"
-        elif platform.system() == "Windows":
-            return "C:\\Program Files\\Xray\\xray.exe"
-        else:
-            return "/usr/bin/xray"
+        return _DEFAULT_XRAY_BINARY
 
-    def get_xray_assets_folder(self) -> Optional[str]:
+    def get_xray_assets_folder(
+        self, db_settings: Optional[SettingsModel] = None
+    ) -> Optional[str]:
         """Get the xray assets folder from database settings"""
         try:
-            db_settings = self.db.get_settings()
+            if db_settings is None:
+                db_settings = self.db.get_settings()
             if db_settings.xray_assets_folder:
                 return db_settings.xray_assets_folder
         except Exception as e:
@@ -94,19 +178,12 @@ class ProcessManager:
             # Try to run xray version command
             xray_binary = self.get_effective_xray_binary()
 
-            # On Windows, hide the console window
-            creationflags = 0
-            if platform.system() == "Windows":
-                import subprocess
-
-                creationflags = subprocess.CREATE_NO_WINDOW
-
             process = await asyncio.create_subprocess_exec(
                 xray_binary,
                 "version",
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
-                creationflags=creationflags,
+                creationflags=_CREATIONFLAGS,
             )
 
             stdout, stderr = await process.communicate()
@@ -127,15 +204,14 @@ class ProcessManager:
                 # Example output:
                 # Xray 1.8.4 (Xray, Penetrates Everything.) Custom (go1.21.1 linux/amd64)
                 # A more robust parser:
-                import re
-
                 lines = version_output.split("\n")
                 for line in lines:
                     line = line.strip()
                     # Match version line: Xray 1.8.4 (Xray, Penetrates Everything.) 2cba2c4 (go1.24.1 linux/amd64)
-                    m = re.match(
-                        r"^Xray\s+([0-9]+\.[0-9]+\.[0-9]+)[^\n]*?(?:\s+([0-9a-f]{7,}))?\s*\((go[0-9.]+)\s+([^\s)]+)\)",
-                        line,
+                    m = (
+                        _XRAY_VERSION_RE.match(line)
+                        if line.startswith("Xray")
+                        else None
                     )
                     if m:
                         version_info["version"] = m.group(1)
@@ -146,23 +222,22 @@ class ProcessManager:
                         continue
 
                     # Fallbacks for other lines
-                    if "commit:" in line.lower():
+                    line_lower = line.lower()
+                    if "commit:" in line_lower:
                         version_info["commit"] = line.split(":", 1)[1].strip()
-                    elif "go version" in line.lower():
+                    elif "go version" in line_lower:
                         # e.g. go version go1.24.1 linux/amd64
-                        go_version_match = re.search(
-                            r"go version ([^\s]+)", line, re.IGNORECASE
-                        )
+                        go_version_match = _GO_VERSION_RE.search(line)
                         if go_version_match:
                             version_info["go_version"] = go_version_match.group(1)
-                        arch_match = re.search(r"(amd64|arm64|386|arm)", line)
+                        arch_match = _ARCH_RE.search(line)
                         if arch_match:
                             version_info["arch"] = arch_match.group(1)
                     elif "/" in line and any(
                         arch in line for arch in ["amd64", "arm64", "386", "arm"]
                     ):
                         # Try to extract arch from e.g. linux/amd64
-                        arch_match = re.search(r"(amd64|arm64|386|arm)", line)
+                        arch_match = _ARCH_RE.search(line)
                         if arch_match:
                             version_info["arch"] = arch_match.group(1)
 
@@ -205,54 +280,54 @@ class ProcessManager:
         )
         if success:
             self.current_server_id = server_id
+            self._notify_state_change()
 
         return success, error_msg
 
-    def _apply_port_overrides(
-        self, config: Dict, socks_port: Optional[int], http_port: Optional[int]
+    def _apply_runtime_overrides(
+        self,
+        config: Dict,
+        socks_port: Optional[int],
+        http_port: Optional[int],
+        db_settings: Optional[SettingsModel],
     ) -> Dict:
-        """Apply global port overrides to inbound configurations at runtime"""
-        if not config.get("inbounds") or (not socks_port and not http_port):
-            return config
-        modified_config = deepcopy(config)
-
-        for inbound in modified_config.get("inbounds", []):
-            tag = inbound.get("tag", "").lower()
-
-            if socks_port and "socks" in tag:
-                original_port = inbound.get("port")
-                inbound["port"] = socks_port
-                logger.info(f"Overriding SOCKS port: {original_port} -> {socks_port}")
-            elif http_port and "http" in tag:
-                original_port = inbound.get("port")
-                inbound["port"] = http_port
-                logger.info(f"Overriding HTTP port: {original_port} -> {http_port}")
+        """Apply port and log level overrides to a copy of the xray configuration
 
-        return modified_config
-
-    def _apply_log_level_override(self, config: Dict) -> Dict:
-        """Apply global log level override to xray configuration"""
-        try:
-            db_settings = self.db.get_settings()
-            if db_settings.xray_log_level:
-                modified_config = deepcopy(config)
+        Only the sections being changed are copied, so the stored config is
+        never modified.
+        """
+        override_ports = bool(config.get("inbounds")) and bool(socks_port or http_port)
+        log_level = db_settings.xray_log_level if db_settings else None
+        if not override_ports and not log_level:
+            return config
 
-                # Ensure log section exists
-                if "log" not in modified_config:
-                    modified_config["log"] = {}
+        modified_config = dict(config)
 
-                # Override the log level
-                original_level = modified_config["log"].get("loglevel", "warning")
-                modified_config["log"]["loglevel"] = db_settings.xray_log_level
+        if override_ports:
+            inbounds = [dict(inbound) for inbound in config["inbounds"]]
+            for inbound in inbounds:
+                tag = inbound.get("tag", "").lower()
 
-                logger.info(
-                    f"Overriding xray log level: {original_level} -> {db_settings.xray_log_level}"
-                )
-                return modified_config
-        except Exception as e:
-            logger.warning(f"Failed to apply log level override: {e}")
+                if socks_port and "socks" in tag:
+                    original_port = inbound.get("port")
+                    inbound["port"] = socks_port
+                    logger.info(
+                        f"Overriding SOCKS port: {original_port} -> {socks_port}"
+                    )
+                elif http_port and "http" in tag:
+                    original_port = inbound.get("port")
+                    inbound["port"] = http_port
+                    logger.info(f"Overriding HTTP port: {original_port} -> {http_port}")
+            modified_config["inbounds"] = inbounds
+
+        if log_level:
+            log_section = dict(config.get("log") or {})
+            original_level = log_section.get("loglevel", "warning")
+            log_section["loglevel"] = log_level
+            modified_config["log"] = log_section
+            logger.info(f"Overriding xray log level: {original_level} -> {log_level}")
 
-        return config
+        return modified_config
 
     async def start_server(
         self,
@@ -267,26 +342,32 @@ class ProcessManager:
         Returns:
             Tuple[bool, Optional[str]]: (success, error_message)
         """
-        if server_id in self.running_processes:
+        if server_id in self.servers:
             logger.warning(f"Server {server_id} is already running")
             return False, None
 
         try:
-            # Apply port overrides at runtime (not stored in database)
-            runtime_config = self._apply_port_overrides(config, socks_port, http_port)
+            # Read settings once for the overrides, binary and assets folder
+            try:
+                db_settings = self.db.get_settings()
+            except Exception as e:
+                logger.warning(f"Failed to get database settings: {e}")
+                db_settings = None
 
-            # Apply log level override at runtime (not stored in database)
-            runtime_config = self._apply_log_level_override(runtime_config)
+            # Apply port and log level overrides at runtime (not stored in database)
+            runtime_config = self._apply_runtime_overrides(
+                config, socks_port, http_port, db_settings
+            )
 
-            # Convert config to JSON string with UUID support
-            config_json = json.dumps(runtime_config, indent=2, cls=UUIDEncoder)
+            # Serialize compactly; orjson handles UUID/datetime/enum values natively
+            config_json = orjson.dumps(runtime_config)
             logger.debug(
                 f"Starting server {server_id} with config size: {len(config_json)} bytes"
             )
 
             # Get effective xray binary and assets folder
-            xray_binary = self.get_effective_xray_binary()
-            xray_assets_folder = self.get_xray_assets_folder()
+            xray_binary = self.get_effective_xray_binary(db_settings)
+            xray_assets_folder = self.get_xray_assets_folder(db_settings)
 
             # Prepare environment variables
             env = None
@@ -298,13 +379,6 @@ class ProcessManager:
                 )
 
             # Create async subprocess
-            # On Windows, hide the console window
-            creationflags = 0
-            if platform.system() == "Windows":
-                import subprocess
-
-                creationflags = subprocess.CREATE_NO_WINDOW
-
             process = await asyncio.create_subprocess_exec(
                 xray_binary,
                 "run",
@@ -315,14 +389,13 @@ class ProcessManager:
                 stderr=asyncio.subprocess.STDOUT,
                 limit=1024 * 1024,  # 1MB buffer limit
                 env=env,
-                creationflags=creationflags,
+                creationflags=_CREATIONFLAGS,
             )
 
-            # Send config via stdin
-            process.stdin.write(config_json.encode())
-            await process.stdin.drain()
+            # Send config via stdin; the transport flushes any buffered data
+            # before closing the pipe, so there's no need to await it
+            process.stdin.write(config_json)
             process.stdin.close()
-            await process.stdin.wait_closed()
 
             # Store process information with runtime config (including port overrides)
             process_info = ProcessInfo(
@@ -333,17 +406,17 @@ class ProcessManager:
                 config=runtime_config,  # Store the config with applied overrides
             )
 
-            self.running_processes[server_id] = process_info
-            self.process_handles[server_id] = process
-
-            # Create log queue for this server with limited size
-            self.log_queues[server_id] = asyncio.Queue(maxsize=1000)
+            runtime = ServerRuntime(info=process_info, process=process)
+            self.servers[server_id] = runtime
 
             # Start log reading task
-            asyncio.create_task(self._read_process_logs(server_id, process))
+            asyncio.create_task(self._read_process_logs(runtime))
 
-            # Give the process a moment to start and check if it's still running
-            await asyncio.sleep(0.1)
+            # Give the process a moment to start, returning early if it dies
+            try:
+                await asyncio.wait_for(process.wait(), timeout=0.1)
+            except asyncio.TimeoutError:
+                pass
 
             if process.returncode is not None:
                 # Process died immediately, clean up and return failure
@@ -369,15 +442,11 @@ class ProcessManager:
                     logger.debug(f"Failed to read error output: {ex}")
 
                 # Clean up
-                if server_id in self.running_processes:
-                    del self.running_processes[server_id]
-                if server_id in self.process_handles:
-                    del self.process_handles[server_id]
-                if server_id in self.log_queues:
-                    del self.log_queues[server_id]
+                self._remove_server(server_id)
                 return False, error_details
 
             logger.info(f"Started server {server_id} with PID {process.pid}")
+            self._notify_state_change()
             return True, None
 
         except Exception as e:
@@ -385,49 +454,42 @@ class ProcessManager:
             logger.error(f"Failed to start server {server_id}: {error_msg}")
 
             # Clean up on exception
-            if server_id in self.running_processes:
-                del self.running_processes[server_id]
-
-            if server_id in self.process_handles:
-                del self.process_handles[server_id]
-            if server_id in self.log_queues:
-                del self.log_queues[server_id]
+            self._remove_server(server_id)
 
             return False, f"Failed to start server: {error_msg}"
 
     async def stop_server(self, server_id: UUID) -> bool:
         """Stop a running server"""
-        if server_id not in self.running_processes:
+        runtime = self.servers.get(server_id)
+        if runtime is None:
             logger.warning(f"Server {server_id} is not running")
             return False
 
         try:
-            process = self.process_handles[server_id]
+            process = runtime.process
 
-            # Try graceful termination first
-            process.terminate()
+            # An exited process only needs cleaning up
+            if process.returncode is None:
+                # Try graceful termination first
+                process.terminate()
 
-            # Wait for process to terminate
-            try:
-                await asyncio.wait_for(process.wait(), timeout=10)
-            except asyncio.TimeoutError:
-                # Force kill if doesn't terminate gracefully
-                process.kill()
-                await process.wait()
+                # Wait for process to terminate
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=10)
+                except asyncio.TimeoutError:
+                    # Force kill if doesn't terminate gracefully
+                    process.kill()
+                    await process.wait()
 
             # Clean up
-            del self.running_processes[server_id]
-            del self.process_handles[server_id]
-
-            # Clean up log queue
-            if server_id in self.log_queues:
-                del self.log_queues[server_id]
+            self._remove_server(server_id)
 
             # Clear current server if this was it
             if self.current_server_id == server_id:
                 self.current_server_id = None
 
             logger.info(f"Stopped server {server_id}")
+            self._notify_state_change()
             return True
 
         except Exception as e:
@@ -447,10 +509,9 @@ class ProcessManager:
         Returns:
             Tuple[bool, Optional[str]]: (success, error_message)
         """
-        if server_id in self.running_processes:
+        if server_id in self.servers:
+            # stop_server() waits for the process to exit
             await self.stop_server(server_id)
-            # Small delay to ensure clean shutdown
-            await asyncio.sleep(1)
 
         return await self.start_server(
             server_id, subscription_id, config, socks_port, http_port
@@ -458,42 +519,49 @@ class ProcessManager:
 
     def is_server_running(self, server_id: UUID) -> bool:
         """Check if a server is currently running"""
-        if server_id not in self.running_processes:
-            return False
-
-        process = self.process_handles.get(server_id)
-        if process is None:
+        runtime = self.servers.get(server_id)
+        if runtime is None:
             return False
 
         # Check if process is still alive
-        if process.returncode is not None:
+        if runtime.process.returncode is not None:
             # Process has terminated, clean up
-            if server_id in self.running_processes:
-                del self.running_processes[server_id]
-            if server_id in self.process_handles:
-                del self.process_handles[server_id]
-            if server_id in self.log_queues:
-                del self.log_queues[server_id]
+            self._remove_server(server_id)
+            self._notify_state_change()
             return False
 
         return True
 
+    def _remove_server(self, server_id: UUID) -> Optional[ServerRuntime]:
+        """Forget a server's runtime state, ending its log streams"""
+        runtime = self.servers.pop(server_id, None)
+        if runtime is not None:
+            runtime.close_logs()
+        return runtime
+
     def get_process_info(self, server_id: UUID) -> Optional[ProcessInfo]:
         """Get process information for a server"""
-        return self.running_processes.get(server_id)
+        runtime = self.servers.get(server_id)
+        return runtime.info if runtime else None
 
     def get_server_ports(self, server_id: UUID) -> List[int]:
         """Get the allocated ports for a server (legacy method for backward compatibility)"""
         port_info = self.get_server_port_info(server_id)
-        return [port["port"] for port in port_info]
+        return [port for port, _, _ in port_info]
+
+    def get_server_port_info(
+        self, server_id: UUID
+    ) -> List[Tuple[int, str, Optional[str]]]:
+        """Get detailed port information including protocols for a server
 
-    def get_server_port_info(self, server_id: UUID) -> List[Dict[str, any]]:
-        """Get detailed port information including protocols for a server"""
-        if server_id not in self.running_processes:
+        Returns:
+            List[Tuple[int, str, Optional[str]]]: (port, protocol, tag) per inbound
+        """
+        runtime = self.servers.get(server_id)
+        if runtime is None:
             return []
 
-        process_info = self.running_processes[server_id]
-        config = process_info.config
+        config = runtime.info.config
         port_info = []
 
         if config and "inbounds" in config:
@@ -502,13 +570,7 @@ class ProcessManager:
                     tag = inbound.get("tag", "")
                     protocol = self._extract_protocol_from_tag(tag, inbound)
 
-                    port_info.append(
-                        {
-                            "port": inbound["port"],
-                            "protocol": protocol,
-                            "tag": tag if tag else None,
-                        }
-                    )
+                    port_info.append((inbound["port"], protocol, tag if tag else None))
 
         return port_info
 
@@ -517,18 +579,9 @@ class ProcessManager:
         tag_lower = tag.lower() if tag else ""
 
         # Check tag for common protocol indicators
-        if "socks" in tag_lower:
-            return "socks"
-        elif "http" in tag_lower:
-            return "http"
-        elif "trojan" in tag_lower:
-            return "trojan"
-        elif "vless" in tag_lower:
-            return "vless"
-        elif "vmess" in tag_lower:
-            return "vmess"
-        elif "shadowsocks" in tag_lower or "ss" in tag_lower:
-            return "shadowsocks"
+        for needle, protocol in _TAG_PROTOCOLS:
+            if needle in tag_lower:
+                return protocol
 
         # Check inbound protocol field if available
         if "protocol" in inbound:
@@ -560,12 +613,25 @@ class ProcessManager:
             return self.get_server_ports(self.current_server_id)
         return []
 
-    def get_current_server_port_info(self) -> List[Dict[str, any]]:
+    def get_current_server_port_info(self) -> List[Tuple[int, str, Optional[str]]]:
         """Get detailed port information for the currently running server"""
         if self.current_server_id:
             return self.get_server_port_info(self.current_server_id)
         return []
 
+    def snapshot(self) -> CurrentServerSnapshot:
+        """Get running state, ID, process info and ports of the current server at once"""
+        server_id = self.current_server_id
+        if server_id is None or not self.is_server_running(server_id):
+            return CurrentServerSnapshot(is_running=False)
+
+        return CurrentServerSnapshot(
+            is_running=True,
+            server_id=server_id,
+            info=self.get_process_info(server_id),
+            port_info=self.get_server_port_info(server_id),
+        )
+
     async def stop_current_server(self) -> bool:
         """Stop the currently running server"""
         if self.current_server_id:
@@ -590,14 +656,51 @@ class ProcessManager:
             )
         return False, "No server is currently running"
 
-    async def _read_process_logs(
-        self, server_id: UUID, process: asyncio.subprocess.Process
-    ):
-        """Read logs from a process and queue them"""
+    async def restart_running_server(self, reason: str) -> bool:
+        """Restart the running server with its current config, if any
+
+        Returns:
+            bool: True if a server was running and restarted successfully
+        """
+        try:
+            snapshot = self.snapshot()
+            if not snapshot.is_running:
+                return False
+
+            server_id = snapshot.server_id
+            logger.info(f"Restarting server {server_id} after {reason}")
+
+            server_info = snapshot.info
+            if not server_info:
+                logger.warning(f"Could not find server info for {server_id}")
+                return False
+
+            await self.stop_server(server_id)
+            success, error_msg = await self.start_single_server(
+                server_info.server_id,
+                server_info.subscription_id,
+                server_info.config,
+            )
+
+            if success:
+                logger.info(f"Successfully restarted server {server_id}")
+                return True
+            else:
+                logger.error(f"Failed to restart server {server_id}: {error_msg}")
+                return False
+        except Exception as e:
+            logger.error(f"Failed to restart server: {e}")
+            return False
+
+    async def _read_process_logs(self, runtime: ServerRuntime):
+        """Read logs from a process into its log buffer"""
+        server_id = runtime.info.server_id
+        stdout = runtime.process.stdout
+        buffer = runtime.log_buffer
         try:
             while True:
                 # Use async readline to avoid blocking
-                line_bytes = await process.stdout.readline()
+                line_bytes = await stdout.readline()
                 if not line_bytes:
                     break
 
@@ -605,46 +708,48 @@ class ProcessManager:
                 if not line:
                     continue
 
-                # Queue the log line
-                if server_id in self.log_queues:
-                    try:
-                        await self.log_queues[server_id].put(
-                            {
-                                "timestamp": datetime.now(),
-                                "server_id": server_id,
-                                "message": line,
-                            }
-                        )
-                    except asyncio.QueueFull:
-                        # Queue is full, skip this log entry
-                        pass
-                    except Exception:
-                        # Queue might be closed or other error
-                        break
+                # Stop once the server has been stopped
+                if runtime.logs_closed:
+                    break
+
+                # Buffer the log line; a full buffer drops its oldest line
+                buffer.append(
+                    {
+                        # Epoch seconds; formatted only if a client reads the log
+                        "timestamp": time(),
+                        "server_id": server_id,
+                        "message": line,
+                    }
+                )
+                runtime.log_event.set()
 
         except Exception as e:
             logger.error(f"Error reading logs for server {server_id}: {e}")
         finally:
+            # Output has ended, so let log streams finish once they drain
+            runtime.close_logs()
             logger.debug(f"Log reading task for server {server_id} ended")
 
     async def get_server_logs(self, server_id: UUID) -> AsyncGenerator[Dict, None]:
         """Get real-time logs for a specific server"""
-        if server_id not in self.log_queues:
+        runtime = self.servers.get(server_id)
+        if runtime is None or runtime.logs_closed:
             return
 
-        queue = self.log_queues[server_id]
-
+        buffer = runtime.log_buffer
+        event = runtime.log_event
         try:
             while True:
-                # Wait for log message with timeout
-                try:
-                    log_entry = await asyncio.wait_for(queue.get(), timeout=1.0)
-                    yield log_entry
-                except asyncio.TimeoutError:
-                    # Check if server is still running
-                    if not self.is_server_running(server_id):
-                        break
-                    continue
+                while buffer:
+                    yield buffer.popleft()
+
+                # Closed logs mean the server stopped or its output ended
+                if runtime.logs_closed:
+                    break
+
+                # Sleep until the reader adds lines or the logs are closed
+                event.clear()
+                await event.wait()
         except Exception as e:
             logger.error(f"Error streaming logs for server {server_id}: {e}")
 
@@ -664,44 +769,63 @@ class ProcessManager:
 
     async def shutdown_all(self):
         """Shutdown all running servers"""
-        server_ids = list(self.running_processes.keys())
-        for server_id in server_ids:
-            await self.stop_server(server_id)
+        # Each stop can wait for a graceful exit, so stop them all concurrently
+        server_ids = list(self.servers.keys())
+        await asyncio.gather(
+            *(self.stop_server(server_id) for server_id in server_ids),
+            return_exceptions=True,
+        )
 
         logger.info("All servers stopped")
 
-    def _find_available_port(self, start_port: int = 10800) -> int:
-        """Find an available port starting from start_port"""
-        port = start_port
-        while port < 65535:
-            if self._is_port_available(port):
-                return port
-            port += 1
-        raise RuntimeError("No available ports found")
-
-    def _is_port_available(self, port: int) -> bool:
-        """Check if a port is available for binding"""
-        try:
-            with socket(AF_INET, SOCK_STREAM) as sock:
-                sock.bind(("127.0.0.1", port))
-                return True
-        except OSError:
-            return False
-
     def _allocate_random_ports(self) -> Tuple[int, int]:
-        """Allocate random available ports for SOCKS and HTTP"""
-        # Find random starting points to avoid conflicts
-        socks_start = randint(10800, 20000)
-        http_start = randint(20001, 30000)
+        """Allocate free ports for SOCKS and HTTP by letting the OS assign them"""
+        # Both sockets are bound at the same time, so the ports are distinct
+        with socket(AF_INET, SOCK_STREAM) as socks_sock:
+            with socket(AF_INET, SOCK_STREAM) as http_sock:
+                socks_sock.bind(("127.0.0.1", 0))
+                http_sock.bind(("127.0.0.1", 0))
+                return socks_sock.getsockname()[1], http_sock.getsockname()[1]
+
+    async def _wait_for_port(
+        self, server_id: UUID, port: int, timeout: float = PORT_READY_TIMEOUT
+    ) -> bool:
+        """Wait until a server's local port accepts connections
+
+        Returns False if the timeout expires or the process exits first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            runtime = self.servers.get(server_id)
+            if runtime is None or runtime.process.returncode is not None:
+                return False
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection("127.0.0.1", port),
+                    timeout=max(deadline - loop.time(), 0),
+                )
+            except (OSError, asyncio.TimeoutError):
+                await asyncio.sleep(PORT_READY_POLL_INTERVAL)
+                continue
+            writer.close()
+            return True
+        return False
 
-        socks_port = self._find_available_port(socks_start)
-        http_port = self._find_available_port(http_start)
+    def _port_wait_failure(self, server_id: UUID, port: int) -> str:
+        """Describe why a server's port never became ready"""
+        runtime = self.servers.get(server_id)
+        if runtime is None:
+            return "Server stopped before the proxy was ready"
 
-        # Ensure ports are different
-        while http_port == socks_port:
-            http_port = self._find_available_port(http_port + 1)
+        returncode = runtime.process.returncode
+        if returncode is None:
+            return f"Proxy port {port} not ready after {PORT_READY_TIMEOUT}s"
 
-        return socks_port, http_port
+        error_details = f"Process exited with code {returncode}"
+        if runtime.log_buffer:
+            error_details += f". Error: {runtime.log_buffer[-1]['message']}"
+        return error_details
 
     async def test_server_connectivity(
         self,
@@ -717,22 +841,18 @@ class ProcessManager:
         socks_port, http_port = self._allocate_random_ports()
 
         try:
-            # Apply random port overrides to config
-            runtime_config = self._apply_port_overrides(config, socks_port, http_port)
-
-            # Apply log level override to config
-            runtime_config = self._apply_log_level_override(runtime_config)
-
             # Start server with random ports
             success, error_msg = await self.start_server(
-                server_id, subscription_id, runtime_config
+                server_id, subscription_id, config, socks_port, http_port
             )
             if not success:
                 error_detail = error_msg or "Failed to start server"
                 return False, None, error_detail, socks_port, http_port
 
-            # Wait a moment for server to fully start
-            await asyncio.sleep(2)
+            # Wait for the proxy to accept connections instead of a fixed delay
+            if not await self._wait_for_port(server_id, http_port):
+                error_detail = self._port_wait_failure(server_id, http_port)
+                return False, None, error_detail, socks_port, http_port
 
             # Test HTTP connectivity through the proxy
             start_time = time()
@@ -768,61 +888,92 @@ class ProcessManager:
         finally:
             # Always stop the test server
             try:
-                if server_id in self.running_processes:
+                if server_id in self.servers:
                     await self.stop_server(server_id)
             except Exception:
                 pass
 
+    async def _test_server(
+        self,
+        server,
+        subscription_id: UUID,
+        test_timeout: int,
+        semaphore: asyncio.Semaphore,
+    ) -> Dict:
+        """Test a single subscription server and build its result entry"""
+        async with semaphore:
+            try:
+                success, ping_ms, error, socks_port, http_port = (
+                    await self.test_server_connectivity(
+                        server.id, subscription_id, server.raw, test_timeout
+                    )
+                )
+                return {
+                    "server_id": server.id,
+                    "remarks": server.remarks,
+                    "success": success,
+                    "ping_ms": ping_ms,
+                    "error": error,
+                    "socks_port": socks_port,
+                    "http_port": http_port,
+                }
+
+            except Exception as e:
+                return {
+                    "server_id": server.id,
+                    "remarks": server.remarks,
+                    "success": False,
+                    "ping_ms": None,
+                    "error": f"Test failed: {str(e)}",
+                    "socks_port": 0,
+                    "http_port": 0,
+                }
+
     async def test_subscription_servers(
-        self, subscription_servers: List, subscription_id: UUID, test_timeout: int = 6
+        self,
+        subscription_servers: List,
+        subscription_id: UUID,
+        test_timeout: int = 6,
+        max_parallel: int = 16,
     ) -> List[Dict]:
         """
-        Test all servers in a subscription concurrently
-        Returns list of test results
+        Test all servers in a subscription concurrently (at most max_parallel at once)
+        Returns list of test results in the same order as subscription_servers
         """
-        results = []
-
-        # Create tasks for concurrent testing
-        tasks = []
-        for server in subscription_servers:
-            task = asyncio.create_task(
-                self.test_server_connectivity(
-                    server.id, subscription_id, server.raw, test_timeout
-                )
+        semaphore = asyncio.Semaphore(max_parallel)
+        return await asyncio.gather(
+            *(
+                self._test_server(server, subscription_id, test_timeout, semaphore)
+                for server in subscription_servers
             )
-            tasks.append((server, task))
-
-        # Wait for all tests to complete
-        for server, task in tasks:
-            try:
-                success, ping_ms, error, socks_port, http_port = await task
-
-                results.append(
-                    {
-                        "server_id": server.id,
-                        "remarks": server.remarks,
-                        "success": success,
-                        "ping_ms": ping_ms,
-                        "error": error,
-                        "socks_port": socks_port,
-                        "http_port": http_port,
-                    }
-                )
-
-            except Exception as e:
-                results.append(
-                    {
-                        "server_id": server.id,
-                        "remarks": server.remarks,
-                        "success": False,
-                        "ping_ms": None,
-                        "error": f"Test failed: {str(e)}",
-                        "socks_port": 0,
-                        "http_port": 0,
-                    }
-                )
+        )
 
-        return results
+    async def iter_subscription_server_tests(
+        self,
+        subscription_servers: List,
+        subscription_id: UUID,
+        test_timeout: int = 6,
+        max_parallel: int = 16,
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        Test all servers in a subscription concurrently (at most max_parallel at once)
+        Yields test results as soon as each one completes
+        """
+        semaphore = asyncio.Semaphore(max_parallel)
+        tasks = [
+            asyncio.create_task(
+                self._test_server(server, subscription_id, test_timeout, semaphore)
+            )
+            for server in subscription_servers
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # Consumer went away early; tests clean up their processes on cancel
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
 
 # Global process manager instance
@@ -2,18 +2,33 @@
 Subscription management service
 """
 
-from copy import deepcopy
+import sys
 from datetime import datetime, timezone
-from json import JSONDecodeError
 from typing import Any, Dict, List, Optional
 from urllib.parse import urljoin
 from uuid import uuid4
 
+import orjson
 from httpx import AsyncClient, HTTPStatusError, RequestError
 
 from app.models.database import ServerModel, SubscriptionModel, SubscriptionUserInfo
 from app.models.schemas import SubscriptionCreate
 
+# Path fragments marking a subscription URL that already serves JSON configs
+_JSON_ENDPOINTS = ("/v2ray-json", "/v2ray", "/json")
+
+
+def _intern_keys(value: Any) -> Any:
+    """Intern dict keys recursively so parsed server configs share key strings"""
+    if isinstance(value, dict):
+        return {
+            (sys.intern(key) if type(key) is str else key): _intern_keys(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_intern_keys(item) for item in value]
+    return value
+
 
 class SubscriptionService:
     """Service for managing proxy subscriptions"""
@@ -27,12 +42,11 @@ class SubscriptionService:
 
     def _normalize_url(self, url: str) -> str:
         """Normalize subscription URL by appending /v2ray-json if missing"""
-        url = str(url).rstrip("/")
+        url = url.rstrip("/")
 
         # Check if URL already ends with v2ray-json or similar
-        if not any(
-            endpoint in url.lower() for endpoint in ["/v2ray-json", "/v2ray", "/json"]
-        ):
+        lowered = url.lower()
+        if not any(endpoint in lowered for endpoint in _JSON_ENDPOINTS):
             url = urljoin(url + "/", "v2ray-json")
 
         return url
@@ -49,18 +63,19 @@ class SubscriptionService:
         """
         try:
             # Parse key-value pairs separated by semicolons
-            pairs = {}
-            for part in userinfo_header.split(";"):
-                part = part.strip()
-                if "=" in part:
-                    key, value = part.split("=", 1)
-                    pairs[key.strip()] = value.strip()
-
-            # Extract values
-            upload = int(pairs.get("upload", 0))
-            download = int(pairs.get("download", 0))
-            total_raw = int(pairs.get("total", 0))
-            expire_raw = int(pairs.get("expire", 0))
+            pairs = {
+                key.strip(): value.strip()
+                for key, sep, value in (
+                    part.partition("=") for part in userinfo_header.split(";")
+                )
+                if sep
+            }
+
+            # Extract values (missing or empty fields count as 0)
+            upload = int(pairs.get("upload") or 0)
+            download = int(pairs.get("download") or 0)
+            total_raw = int(pairs.get("total") or 0)
+            expire_raw = int(pairs.get("expire") or 0)
 
             # Calculate used traffic (upload + download)
             used_traffic = upload + download
@@ -100,8 +115,8 @@ class SubscriptionService:
 
             # Try to parse as JSON
             try:
-                config_data = response.json()
-            except JSONDecodeError:
+                config_data = orjson.loads(response.content)
+            except orjson.JSONDecodeError:
                 # If not JSON, might be base64 encoded or other format
                 raise ValueError("Invalid subscription format: not valid JSON")
 
@@ -150,7 +165,8 @@ class SubscriptionService:
             if "tag" in outbound:
                 remarks = outbound["tag"]
 
-        return remarks, config
+        # Every server repeats the same config keys, so share one copy of each
+        return remarks, _intern_keys(config)
 
     def _apply_port_overrides(
         self,
@@ -159,19 +175,32 @@ class SubscriptionService:
         http_port: Optional[int],
     ) -> Dict[str, Any]:
         """Apply global port overrides to inbound configurations"""
-        if not config.get("inbounds"):
+        inbounds = config.get("inbounds")
+        if not inbounds:
             return config
 
-        modified_config = deepcopy(config)
-
-        for inbound in modified_config.get("inbounds", []):
+        # Only the inbounds are modified, so copy just those instead of the
+        # whole config tree, and only once a tag actually matches
+        modified_inbounds = None
+        for index, inbound in enumerate(inbounds):
             tag = inbound.get("tag", "").lower()
 
             if socks_port and "socks" in tag:
-                inbound["port"] = socks_port
+                port = socks_port
             elif http_port and "http" in tag:
-                inbound["port"] = http_port
+                port = http_port
+            else:
+                continue
+
+            if modified_inbounds is None:
+                modified_inbounds = list(inbounds)
+            modified_inbounds[index] = {**inbound, "port": port}
+
+        if modified_inbounds is None:
+            return config
 
+        modified_config = dict(config)
+        modified_config["inbounds"] = modified_inbounds
         return modified_config
 
     async def create_subscription(
@@ -186,6 +215,7 @@ class SubscriptionService:
 
         # Fetch subscription configuration and user info
         configs, user_info = await self.fetch_subscription_config(normalized_url)
+        apply_overrides = bool(socks_port or http_port)
 
         # Create server models from configs
         servers = []
@@ -193,7 +223,7 @@ class SubscriptionService:
             remarks, clean_config = self._extract_server_info(config)
 
             # Apply port overrides if specified
-            if socks_port or http_port:
+            if apply_overrides:
                 clean_config = self._apply_port_overrides(
                     clean_config, socks_port, http_port
                 )
@@ -209,7 +239,7 @@ class SubscriptionService:
             name=subscription_data.name,
             url=normalized_url,
             servers=servers,
-            last_updated=datetime.now(),
+            last_updated=datetime.now(timezone.utc),
             user_info=user_info,
         )
 
@@ -224,6 +254,7 @@ class SubscriptionService:
         """Update servers for an existing subscription"""
         # Fetch fresh configuration and user info
         configs, user_info = await self.fetch_subscription_config(subscription.url)
+        apply_overrides = bool(socks_port or http_port)
 
         # Create new server models
         new_servers = []
@@ -235,7 +266,7 @@ class SubscriptionService:
             remarks, clean_config = self._extract_server_info(config)
 
             # Apply port overrides if specified
-            if socks_port or http_port:
+            if apply_overrides:
                 clean_config = self._apply_port_overrides(
                     clean_config, socks_port, http_port
                 )
@@ -256,9 +287,11 @@ class SubscriptionService:
 
             new_servers.append(server)
 
-        # Update subscription
-        subscription.servers = new_servers
-        subscription.last_updated = datetime.now()
-        subscription.user_info = user_info
-
-        return subscription
+        # Return an updated copy; the given model may be shared (e.g. cached)
+        return subscription.model_copy(
+            update={
+                "servers": new_servers,
+                "last_updated": datetime.now(timezone.utc),
+                "user_info": user_info,
+            }
+        )
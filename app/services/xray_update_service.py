@@ -2,20 +2,146 @@
 Xray binary update service
 """
 
+import asyncio
 import logging
 import os
 import platform
+from contextlib import suppress
+from enum import Enum
 from hashlib import sha256
 from pathlib import Path
-from shutil import move
+from shutil import copyfileobj
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import Dict, List
-from zipfile import ZipFile
+from typing import Any, Dict, List, Optional, Tuple
+from zipfile import ZipFile, ZipInfo
 
-from httpx import AsyncClient
+import orjson
+from httpx import AsyncClient, HTTPError
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.database.tinydb_manager import ensure_dir
 
 logger = logging.getLogger(__name__)
 
+# How long GitHub release lookups are reused before querying again (seconds)
+RELEASES_CACHE_TTL = 300.0
+
+# Number of recent releases fetched for the version listings
+RELEASES_PAGE_SIZE = 10
+
+# File in the data directory holding GitHub API ETags and their responses
+ETAG_CACHE_FILENAME = "github_etags.json"
+
+# File in the data directory recording which release archive Xray came from
+INSTALL_RECORD_FILENAME = "xray_install.json"
+
+# Size of the chunks downloads are written to disk in (bytes)
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# platform.machine() values mapped to Xray release arch suffixes
+_ARCH_MAP = {
+    "x86_64": "64",
+    "amd64": "64",
+    "i386": "32",
+    "i686": "32",
+    "armv5": "arm32-v5",
+    "armv5tel": "arm32-v5",
+    "armv6": "arm32-v6",
+    "armv6l": "arm32-v6",
+    "armv7": "arm32-v7a",
+    "armv7l": "arm32-v7a",
+    "armv8": "arm64-v8a",
+    "aarch64": "arm64-v8a",
+    "arm64": "arm64-v8a",
+    "mips": "mips32",
+    "mipsle": "mips32le",
+    "mips64": "mips64",
+    "mips64le": "mips64le",
+    "ppc64": "ppc64",
+    "ppc64le": "ppc64le",
+    "riscv64": "riscv64",
+    "s390x": "s390x",
+}
+
+# Names of the Xray binary inside release archives (Windows uses xray.exe)
+_XRAY_BINARY_NAMES = ("xray", "xray.exe")
+
+# Size of the chunks the Xray binary is extracted in (bytes)
+EXTRACT_CHUNK_SIZE = 1 << 20
+
+
+# platform.system() values mapped to Xray release OS suffixes
+_OS_SUFFIX_MAP = {
+    "darwin": "macos",
+    "windows": "windows",
+    "linux": "linux",
+    "freebsd": "freebsd",
+    "openbsd": "openbsd",
+}
+
+# The host doesn't change while running, so resolve its release asset once.
+# Unknown machines default to 64-bit and unknown systems to linux naming.
+_ARCH_SUFFIX = _ARCH_MAP.get(platform.machine().lower(), "64")
+_OS_SUFFIX = _OS_SUFFIX_MAP.get(platform.system().lower(), "linux")
+# Result examples:
+# - Xray-linux-64.zip
+# - Xray-windows-64.zip
+# - Xray-macos-arm64-v8a.zip
+_ASSET_FILENAME = f"Xray-{_OS_SUFFIX}-{_ARCH_SUFFIX}.zip"
+
+
+async def _download_file(client: AsyncClient, url: str, path: Path) -> str:
+    """Stream a download to a file, returning its SHA256 hex digest
+
+    The file is hashed as it is written, so verifying it needs no re-read.
+    """
+    sha256_hash = sha256()
+    async with client.stream("GET", url, follow_redirects=True) as response:
+        response.raise_for_status()
+        size = int(response.headers.get("content-length") or 0)
+        with open(path, "wb") as f:
+            # Reserve the whole file up front so the filesystem allocates it once
+            if size > 0 and hasattr(os, "posix_fallocate"):
+                with suppress(OSError):
+                    os.posix_fallocate(f.fileno(), 0, size)
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                sha256_hash.update(chunk)
+            # Content-Length may not match the decoded body, so trim any excess
+            f.truncate()
+    return sha256_hash.hexdigest()
+
+
+class XrayInstallResult(str, Enum):
+    """Outcome of a successful Xray download"""
+
+    INSTALLED = "installed"
+    ALREADY_INSTALLED = "already_installed"
+
+
+def _write_file_atomic(path: Path, content: bytes) -> None:
+    """Write a file through a temporary sibling so readers never see it partial"""
+    ensure_dir(str(path.parent))
+    temp_path = path.with_name(f"{path.name}.tmp")
+    temp_path.write_bytes(content)
+    os.replace(temp_path, path)
+
+
+def _find_xray_member(zip_ref: ZipFile) -> Optional[ZipInfo]:
+    """Find the Xray binary in a release archive"""
+    # Releases ship the binary at the top level, so try a direct lookup first
+    for name in _XRAY_BINARY_NAMES:
+        try:
+            return zip_ref.getinfo(name)
+        except KeyError:
+            pass
+
+    for file_info in zip_ref.infolist():
+        if os.path.basename(file_info.filename) in _XRAY_BINARY_NAMES:
+            return file_info
+    return None
+
 
 class XrayUpdateService:
     """Service for updating Xray binary"""
@@ -26,283 +152,315 @@ class XrayUpdateService:
             "https://github.com/XTLS/Xray-core/releases/download"
         )
         self.timeout = 30.0
+        self._releases_cache = TTLCache(ttl=RELEASES_CACHE_TTL)
+        self.http_client = AsyncClient(timeout=self.timeout)
+        # Last ETag and parsed body per GitHub API request, for conditional GETs;
+        # persisted so revalidation also works across restarts
+        self._etag_cache: Dict[str, Tuple[str, Any]] = {}
+        self._etag_cache_path = get_settings().data_dir / ETAG_CACHE_FILENAME
+        self._etag_cache_loaded = False
+        self._etag_cache_lock = asyncio.Lock()
+        self._install_record_path = get_settings().data_dir / INSTALL_RECORD_FILENAME
+
+    async def close(self):
+        """Close HTTP client"""
+        await self.http_client.aclose()
+
+    async def _get_github_json(self, path: str, per_page: Optional[int] = None) -> Any:
+        """GET a GitHub API resource, revalidating the last response by ETag
+
+        Unchanged resources come back as 304, which is cheaper and does not
+        count against the unauthenticated rate limit.
+        """
+        await self._load_etag_cache()
+
+        cache_key = path if per_page is None else f"{path}?per_page={per_page}"
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        cached = self._etag_cache.get(cache_key)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = await self.http_client.get(
+            f"{self.github_api_base}{path}",
+            headers=headers,
+            params={"per_page": per_page} if per_page is not None else None,
+        )
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
+        response.raise_for_status()
+
+        data = response.json()
+        etag = response.headers.get("etag")
+        if etag:
+            self._etag_cache[cache_key] = (etag, data)
+            await self._save_etag_cache()
+        return data
+
+    async def _load_etag_cache(self) -> None:
+        """Load the persisted ETag cache on first use"""
+        if self._etag_cache_loaded:
+            return
+        self._etag_cache_loaded = True
 
-    def _get_system_architecture(self) -> str:
-        """Map platform.machine to Xray release arch suffix."""
-        machine = platform.machine().lower()
-
-        # Normalize common variants
-        if machine in {"x86_64", "amd64"}:
-            return "64"
-        if machine in {"i386", "i686"}:
-            return "32"
-        if machine in {"armv5", "armv5tel"}:
-            return "arm32-v5"
-        if machine in {"armv6", "armv6l"}:
-            return "arm32-v6"
-        if machine in {"armv7", "armv7l"}:
-            return "arm32-v7a"
-        if machine in {"armv8", "aarch64", "arm64"}:
-            return "arm64-v8a"
-        if machine in {"mips"}:
-            return "mips32"
-        if machine in {"mipsle"}:
-            return "mips32le"
-        if machine in {"mips64"}:
-            return "mips64"
-        if machine in {"mips64le"}:
-            return "mips64le"
-        if machine in {"ppc64"}:
-            return "ppc64"
-        if machine in {"ppc64le"}:
-            return "ppc64le"
-        if machine in {"riscv64"}:
-            return "riscv64"
-        if machine in {"s390x"}:
-            return "s390x"
-        # Default to 64-bit
-        return "64"
-
-    def _get_os_suffix(self) -> str:
-        """Map platform.system to Xray release OS suffix."""
-        system = platform.system().lower()
-        if system == "darwin":
-            return "macos"
-        if system == "windows":
-            return "windows"
-        if system == "linux":
-            return "linux"
-        if system == "freebsd":
-            return "freebsd"
-        if system == "openbsd":
-            return "openbsd"
-        # Fallback to linux naming
-        return "linux"
-
-    def _build_asset_filename(self) -> str:
-        """Build the exact asset filename for current OS/arch."""
-        os_suffix = self._get_os_suffix()
-        arch_suffix = self._get_system_architecture()
-
-        # Special cases for macOS Intel vs Apple Silicon are covered by arch mapping
-        # Result examples:
-        # - Xray-linux-64.zip
-        # - Xray-windows-64.zip
-        # - Xray-macos-arm64-v8a.zip
-        return f"Xray-{os_suffix}-{arch_suffix}.zip"
-
-    def _get_http_client(self) -> AsyncClient:
-        """Create an AsyncClient with default timeout."""
-        return AsyncClient(timeout=self.timeout)
-
-    async def get_latest_version(self) -> str:
-        """Get the latest Xray release version"""
         try:
-            async with self._get_http_client() as client:
-                response = await client.get(
-                    f"{self.github_api_base}/releases/latest",
-                    headers={"Accept": "application/vnd.github.v3+json"},
+            content = await asyncio.to_thread(self._etag_cache_path.read_bytes)
+            self._etag_cache = {
+                key: (etag, data) for key, (etag, data) in orjson.loads(content).items()
+            }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable ETag cache: {e}")
+
+    async def _save_etag_cache(self) -> None:
+        """Persist the ETag cache"""
+        async with self._etag_cache_lock:
+            content = orjson.dumps(self._etag_cache)
+            try:
+                await asyncio.to_thread(
+                    _write_file_atomic, self._etag_cache_path, content
                 )
-                response.raise_for_status()
+            except OSError as e:
+                logger.warning(f"Failed to save ETag cache: {e}")
+
+    async def _fetch_releases(self, limit: int) -> List[Dict[str, Any]]:
+        """Fetch recent releases, sharing one request between all callers
+
+        The in-flight request itself is cached, so concurrent lookups (such
+        as the version info endpoint) wait on the same GitHub call.
+        """
+        cache_key = ("releases", limit)
+        request = self._releases_cache.get(cache_key)
+        if request is None:
+            request = asyncio.ensure_future(
+                self._get_github_json("/releases", per_page=limit)
+            )
+            self._releases_cache.set(cache_key, request)
 
-                data = response.json()
-                version = data.get("tag_name", "")
+        try:
+            return await asyncio.shield(request)
+        except Exception:
+            self._releases_cache.pop(cache_key)
+            raise
 
+    def _iter_release_versions(self, releases: List[Dict[str, Any]]):
+        """Yield (normalized version, release) pairs for tagged releases"""
+        for release in releases:
+            version = release.get("tag_name", "")
+            if version:
                 # Normalize version (ensure it starts with 'v')
-                if version and not version.startswith("v"):
+                if not version.startswith("v"):
                     version = f"v{version}"
+                yield version, release
 
-                return version
+    async def get_latest_version(self) -> str:
+        """Get the latest Xray release version"""
+        try:
+            # The latest release is nearly always in the recent release list,
+            # which is shared with the version listings
+            releases = await self._fetch_releases(RELEASES_PAGE_SIZE)
+            for version, release in self._iter_release_versions(releases):
+                if not release.get("draft") and not release.get("prerelease"):
+                    return version
+
+            data = await self._get_github_json("/releases/latest")
+            version = data.get("tag_name", "")
+            if version and not version.startswith("v"):
+                version = f"v{version}"
+            return version
 
         except Exception as e:
             logger.error(f"Failed to get latest Xray version: {e}")
             raise RuntimeError(f"Failed to fetch latest version: {str(e)}")
 
-    async def get_available_versions(self, limit: int = 10) -> List[str]:
+    async def get_available_versions(
+        self, limit: int = RELEASES_PAGE_SIZE
+    ) -> List[str]:
         """Get list of available Xray versions"""
         try:
-            async with self._get_http_client() as client:
-                response = await client.get(
-                    f"{self.github_api_base}/releases",
-                    headers={"Accept": "application/vnd.github.v3+json"},
-                    params={"per_page": limit},
-                )
-                response.raise_for_status()
-
-                data = response.json()
-                versions = []
-
-                for release in data:
-                    version = release.get("tag_name", "")
-                    if version:
-                        # Normalize version
-                        if not version.startswith("v"):
-                            version = f"v{version}"
-                        versions.append(version)
-
-                return versions
+            releases = await self._fetch_releases(limit)
+            return [version for version, _ in self._iter_release_versions(releases)]
 
         except Exception as e:
             logger.error(f"Failed to get Xray versions: {e}")
             raise RuntimeError(f"Failed to fetch versions: {str(e)}")
 
     async def get_available_versions_with_sizes(
-        self, limit: int = 10
+        self, limit: int = RELEASES_PAGE_SIZE
     ) -> Dict[str, int]:
         """Get available Xray versions with their download sizes"""
         try:
-            async with self._get_http_client() as client:
-                response = await client.get(
-                    f"{self.github_api_base}/releases",
-                    headers={"Accept": "application/vnd.github.v3+json"},
-                    params={"per_page": limit},
-                )
-                response.raise_for_status()
-
-                data = response.json()
-                filename = self._build_asset_filename()
-                version_sizes = {}
-
-                for release in data:
-                    version = release.get("tag_name", "")
-                    if version:
-                        # Normalize version
-                        if not version.startswith("v"):
-                            version = f"v{version}"
-
-                        # Look for the matching asset in this release
-                        assets = release.get("assets", [])
-                        for asset in assets:
-                            if asset.get("name") == filename:
-                                size = asset.get("size")
-                                if isinstance(size, int):
-                                    version_sizes[version] = size
-                                break
-
-                return version_sizes
+            releases = await self._fetch_releases(limit)
+            filename = _ASSET_FILENAME
+            version_sizes = {}
+
+            for version, release in self._iter_release_versions(releases):
+                # Look for the matching asset in this release
+                for asset in release.get("assets", []):
+                    if asset.get("name") == filename:
+                        size = asset.get("size")
+                        if isinstance(size, int):
+                            version_sizes[version] = size
+                        break
+
+            return version_sizes
 
         except Exception as e:
             logger.error(f"Failed to get Xray versions with sizes: {e}")
             raise RuntimeError(f"Failed to fetch versions with sizes: {str(e)}")
 
-    async def download_xray(self, version: str, target_path: str) -> bool:
-        """Download and install Xray binary"""
+    async def download_xray(self, version: str, target_path: str) -> XrayInstallResult:
+        """Download and install Xray binary, raising RuntimeError on failure"""
         try:
             # Normalize version
             if not version.startswith("v"):
                 version = f"v{version}"
 
-            filename = self._build_asset_filename()
+            filename = _ASSET_FILENAME
             download_url = f"{self.github_releases_base}/{version}/{filename}"
             checksum_url = f"{download_url}.dgst"
 
             logger.info(f"Downloading Xray {version} asset {filename}")
 
+            # Download the small checksum file first, so reinstalling the
+            # version that is already in place can skip the archive download
+            logger.info(f"Downloading checksum from: {checksum_url}")
+            response = await self.http_client.get(checksum_url, follow_redirects=True)
+            response.raise_for_status()
+
+            expected_checksum = None
+            checksum_content = response.text
+            if "Not Found" in checksum_content:
+                logger.warning("Checksum verification not available for this version")
+            else:
+                expected_checksum = self._parse_checksum(checksum_content)
+
+            if expected_checksum and await asyncio.to_thread(
+                self._is_installed, target_path, expected_checksum
+            ):
+                logger.info(f"Xray {version} is already installed at {target_path}")
+                return XrayInstallResult.ALREADY_INSTALLED
+
             # Create temporary directory
             with TemporaryDirectory() as temp_dir:
                 temp_path = Path(temp_dir)
                 zip_file = temp_path / filename
-                checksum_file = temp_path / f"{filename}.dgst"
-
-                # Download files
-                async with self._get_http_client() as client:
-                    # Download zip file
-                    logger.info(f"Downloading from: {download_url}")
-                    response = await client.get(download_url, follow_redirects=True)
-                    response.raise_for_status()
-
-                    with open(zip_file, "wb") as f:
-                        f.write(response.content)
-
-                    # Download checksum file
-                    logger.info(f"Downloading checksum from: {checksum_url}")
-                    response = await client.get(checksum_url, follow_redirects=True)
-                    response.raise_for_status()
-
-                    checksum_content = response.text
-                    if "Not Found" in checksum_content:
-                        logger.warning(
-                            "Checksum verification not available for this version"
-                        )
-                    else:
-                        with open(checksum_file, "w") as f:
-                            f.write(checksum_content)
 
-                        # Verify checksum
-                        await self._verify_checksum(zip_file, checksum_file)
+                # Download zip file
+                logger.info(f"Downloading from: {download_url}")
+                actual_checksum = await _download_file(
+                    self.http_client, download_url, zip_file
+                )
+
+                # Verify checksum
+                if expected_checksum:
+                    self._verify_checksum(actual_checksum, expected_checksum)
 
                 # Extract and install
-                await self._extract_and_install(zip_file, target_path)
+                # Decompressing and writing the binary is blocking work, so
+                # keep it off the event loop
+                await asyncio.to_thread(
+                    self._extract_and_install,
+                    zip_file,
+                    target_path,
+                    bool(expected_checksum),
+                )
+
+            await asyncio.to_thread(self._record_install, target_path, actual_checksum)
 
             logger.info(f"Successfully updated Xray to version {version}")
-            return True
+            return XrayInstallResult.INSTALLED
 
         except Exception as e:
             logger.error(f"Failed to download Xray {version}: {e}")
             raise RuntimeError(f"Download failed: {str(e)}")
 
-    async def _verify_checksum(self, zip_file: Path, checksum_file: Path) -> None:
+    def _parse_checksum(self, checksum_content: str) -> Optional[str]:
+        """Extract the SHA256 checksum from a .dgst file"""
+        # Format: "SHA2-256= <hash>"
+        _, found, rest = checksum_content.partition("256=")
+        fields = rest.split(None, 1)
+        if not found or not fields:
+            logger.warning("Could not parse checksum file")
+            return None
+        return fields[0].lower()
+
+    def _verify_checksum(self, actual_checksum: str, expected_checksum: str) -> None:
         """Verify the downloaded file checksum"""
-        try:
-            # Read expected checksum
-            checksum_content = checksum_file.read_text()
-
-            # Extract SHA256 checksum (format: "SHA256= <hash>")
-            import re
-
-            match = re.search(r"256=\s*([a-fA-F0-9]+)", checksum_content)
-            if not match:
-                logger.warning("Could not parse checksum file")
-                return
+        if expected_checksum != actual_checksum:
+            logger.error("Checksum verification failed")
+            raise RuntimeError("SHA256 checksum verification failed")
 
-            expected_checksum = match.group(1).lower()
+        logger.info("Checksum verification passed")
 
-            # Calculate actual checksum
-            sha256_hash = sha256()
-            with open(zip_file, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
-
-            actual_checksum = sha256_hash.hexdigest()
-
-            if expected_checksum != actual_checksum:
-                raise RuntimeError("SHA256 checksum verification failed")
-
-            logger.info("Checksum verification passed")
-
-        except Exception as e:
-            logger.error(f"Checksum verification failed: {e}")
-            raise
+    def _is_installed(self, target_path: str, asset_checksum: str) -> bool:
+        """Check whether the binary at target_path came from the given archive"""
+        try:
+            record = orjson.loads(self._install_record_path.read_bytes())
+            stat = os.stat(target_path)
+        except (OSError, orjson.JSONDecodeError):
+            return False
+
+        # The size and mtime catch binaries replaced outside the updater
+        return record == {
+            "path": os.path.abspath(target_path),
+            "asset_sha256": asset_checksum,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def _record_install(self, target_path: str, asset_checksum: str) -> None:
+        """Remember which archive the installed binary came from"""
+        try:
+            stat = os.stat(target_path)
+            record = {
+                "path": os.path.abspath(target_path),
+                "asset_sha256": asset_checksum,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+            _write_file_atomic(self._install_record_path, orjson.dumps(record))
+        except OSError as e:
+            logger.warning(f"Failed to record Xray install: {e}")
+
+    def _extract_and_install(
+        self, zip_file: Path, target_path: str, verified: bool = False
+    ) -> None:
+        """Extract zip file and install xray binary
 
-    async def _extract_and_install(self, zip_file: Path, target_path: str) -> None:
-        """Extract zip file and install xray binary"""
+        When the archive's SHA-256 has been verified, the per-entry CRC-32
+        check is skipped since it cannot catch anything the digest didn't.
+        """
         try:
             # Create target directory if it doesn't exist
             target_dir = os.path.dirname(target_path)
             if target_dir:
-                os.makedirs(target_dir, exist_ok=True)
+                ensure_dir(target_dir)
 
             # Extract zip file
             with ZipFile(zip_file, "r") as zip_ref:
-                # Look for xray binary in the zip
-                xray_found = False
-                # Find binary inside the archive (Windows uses xray.exe)
-                binary_candidates = {"xray", "xray.exe"}
-                for file_info in zip_ref.filelist:
-                    basename = os.path.basename(file_info.filename)
-                    if basename in binary_candidates:
-                        # Extract xray binary to temporary location
-                        with NamedTemporaryFile(delete=False) as temp_binary:
-                            temp_binary.write(zip_ref.read(file_info.filename))
-                            temp_binary_path = temp_binary.name
-                        # Make it executable and move to target location
-                        os.chmod(temp_binary_path, 0o755)
-                        move(temp_binary_path, target_path)
-                        xray_found = True
-                        break
-
-                if not xray_found:
+                binary_info = _find_xray_member(zip_ref)
+                if binary_info is None:
                     raise RuntimeError("xray binary not found in downloaded archive")
+
+                # Stream the binary next to the target so the final rename is
+                # atomic, without holding the whole binary in memory
+                with zip_ref.open(binary_info) as source, NamedTemporaryFile(
+                    dir=target_dir or ".", delete=False
+                ) as temp_binary:
+                    temp_binary_path = temp_binary.name
+                    if verified:
+                        source._expected_crc = None
+                    try:
+                        copyfileobj(source, temp_binary, EXTRACT_CHUNK_SIZE)
+                    except BaseException:
+                        temp_binary.close()
+                        os.unlink(temp_binary_path)
+                        raise
+
+            # Make it executable and move to target location
+            os.chmod(temp_binary_path, 0o755)
+            os.replace(temp_binary_path, target_path)
             logger.info(f"Xray binary installed to: {target_path}")
 
         except Exception as e:
@@ -318,6 +476,11 @@ class GeodataUpdateService:
             "https://github.com/Loyalsoldier/v2ray-rules-dat/releases/latest/download"
         )
         self.timeout = 30.0
+        self.http_client = AsyncClient(timeout=60.0)
+
+    async def close(self):
+        """Close HTTP client"""
+        await self.http_client.aclose()
 
     async def update_geodata(self, assets_folder: str) -> Dict[str, bool]:
         """Download and update geoip.dat and geosite.dat files"""
@@ -326,9 +489,8 @@ class GeodataUpdateService:
                 raise RuntimeError("Assets folder path is required")
 
             # Create assets directory if it doesn't exist
-            os.makedirs(assets_folder, exist_ok=True)
+            ensure_dir(assets_folder)
 
-            results = {}
             files_to_download = [
                 ("geoip.dat", f"{self.geodata_base_url}/geoip.dat"),
                 ("geosite.dat", f"{self.geodata_base_url}/geosite.dat"),
@@ -336,56 +498,20 @@ class GeodataUpdateService:
 
             logger.info(f"Updating geodata in: {assets_folder}")
 
-            # Create temporary directory
-            with TemporaryDirectory() as temp_dir:
+            # Create the temporary directory on the same filesystem as the
+            # assets so installing a file is an atomic rename
+            with TemporaryDirectory(dir=assets_folder) as temp_dir:
                 temp_path = Path(temp_dir)
 
-                async with AsyncClient(timeout=60.0) as client:
-                    for filename, url in files_to_download:
-                        try:
-                            logger.info(f"Downloading {filename}")
-
-                            # Download file
-                            response = await client.get(url, follow_redirects=True)
-                            response.raise_for_status()
-
-                            temp_file = temp_path / filename
-                            with open(temp_file, "wb") as f:
-                                f.write(response.content)
-
-                            # Download checksum if available
-                            checksum_url = f"{url}.sha256sum"
-                            try:
-                                checksum_response = await client.get(
-                                    checksum_url, follow_redirects=True
-                                )
-                                checksum_response.raise_for_status()
-
-                                checksum_file = temp_path / f"{filename}.sha256sum"
-                                with open(checksum_file, "w") as f:
-                                    f.write(checksum_response.text)
-
-                                # Verify checksum
-                                await self._verify_geodata_checksum(
-                                    temp_file, checksum_file
-                                )
-
-                            except Exception as e:
-                                logger.warning(
-                                    f"Checksum verification not available for {filename}: {e}"
-                                )
-
-                            # Move to target location
-                            target_file = os.join(assets_folder, filename)
-                            move(str(temp_file), target_file)
-                            os.chmod(target_file, 0o644)
-
-                            results[filename] = True
-                            logger.info(f"Successfully updated {filename}")
-
-                        except Exception as e:
-                            logger.error(f"Failed to update {filename}: {e}")
-                            results[filename] = False
+                # The files are independent, so fetch them concurrently
+                results = dict(
+                    await asyncio.gather(
+                        *(
+                            self._update_file(temp_path, assets_folder, filename, url)
+                            for filename, url in files_to_download
+                        )
+                    )
+                )
 
             return results
 
@@ -393,31 +519,72 @@ class GeodataUpdateService:
             logger.error(f"Failed to update geodata: {e}")
             raise RuntimeError(f"Geodata update failed: {str(e)}")
 
-    async def _verify_geodata_checksum(
-        self, file_path: Path, checksum_file: Path
-    ) -> None:
-        """Verify geodata file checksum"""
+    async def _update_file(
+        self,
+        temp_path: Path,
+        assets_folder: str,
+        filename: str,
+        url: str,
+    ) -> Tuple[str, bool]:
+        """Download, verify and install a single geodata file"""
         try:
-            checksum_content = checksum_file.read_text().strip()
+            logger.info(f"Downloading {filename}")
+
+            # Download file
+            temp_file = temp_path / filename
+            actual_checksum = await _download_file(self.http_client, url, temp_file)
+
+            # Download checksum if available
+            checksum_url = f"{url}.sha256sum"
+            checksum_content = None
+            try:
+                checksum_response = await self.http_client.get(
+                    checksum_url, follow_redirects=True
+                )
+                checksum_response.raise_for_status()
+                checksum_content = checksum_response.text
+            except HTTPError as e:
+                logger.warning(
+                    f"Checksum verification not available for {filename}: {e}"
+                )
 
-            # Parse checksum (format: "<hash>  <filename>")
-            expected_checksum = checksum_content.split()[0].lower()
+            # Verify checksum; a mismatch raises, so the file isn't installed
+            if checksum_content is not None:
+                self._verify_geodata_checksum(
+                    filename, actual_checksum, checksum_content
+                )
 
-            # Calculate actual checksum
-            sha256_hash = sha256()
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
+            # Move to target location
+            target_file = os.path.join(assets_folder, filename)
+            os.replace(temp_file, target_file)
+            os.chmod(target_file, 0o644)
 
-            actual_checksum = sha256_hash.hexdigest()
+            logger.info(f"Successfully updated {filename}")
+            return filename, True
+
+        except Exception as e:
+            logger.error(f"Failed to update {filename}: {e}")
+            return filename, False
+
+    def _verify_geodata_checksum(
+        self, filename: str, actual_checksum: str, checksum_content: str
+    ) -> None:
+        """Verify geodata file checksum"""
+        try:
+            # Parse checksum (format: "<hash>  <filename>")
+            fields = checksum_content.split(None, 1)
+            if not fields:
+                logger.warning(f"Checksum verification not available for {filename}")
+                return
+            expected_checksum = fields[0].lower()
 
             if expected_checksum != actual_checksum:
                 raise RuntimeError(
-                    f"SHA256 checksum verification failed for {file_path.name}"
+                    f"SHA256 checksum verification failed for {filename}"
                 )
 
-            logger.info(f"Checksum verification passed for {file_path.name}")
+            logger.info(f"Checksum verification passed for {filename}")
 
         except Exception as e:
-            logger.error(f"Checksum verification failed for {file_path.name}: {e}")
+            logger.error(f"Checksum verification failed for {filename}: {e}")
             raise
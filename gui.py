@@ -37,6 +37,26 @@ class WindowApi:
     API exposed to JavaScript for controlling the pywebview window.
     """
 
+    # Methods exposed to JavaScript
+    EXPOSED = (
+        "show",
+        "hide",
+        "minimize",
+        "maximize",
+        "restore",
+        "close",
+        "toggle",
+        "quit",
+        "is_visible",
+        "is_focused",
+        "toggle_fullscreen",
+        "set_on_top",
+        "resize",
+        "move",
+        "get_size",
+        "get_position",
+    )
+
     def __init__(self, window):
         self.window = window
 
@@ -164,12 +184,7 @@ def setup_tray(window: webview.Window, api: WindowApi):
 
 
 def register_api(window, api):
-    methods = [
-        getattr(api, name)
-        for name in dir(api)
-        if not name.startswith("_") and callable(getattr(api, name))
-    ]
-    window.expose(*methods)
+    window.expose(*(getattr(api, name) for name in WindowApi.EXPOSED))
 
 
 def start_gui(window: webview.Window):
@@ -1,9 +1,12 @@
 from gui import create_main_window, start_gui
 from server import settings, start_server_thread
 
+# Seconds to wait for the backend to finish shutting down on exit
+SERVER_SHUTDOWN_TIMEOUT = 10.0
+
 if __name__ == "__main__":
     # Start backend
-    start_server_thread()
+    server, server_thread = start_server_thread()
 
     # Create frontend window
     url = f"http://{settings.api_host}:{settings.api_port}"
@@ -11,3 +14,7 @@ if __name__ == "__main__":
 
     # Run GUI + Tray
     start_gui(window)
+
+    # Shut the backend down cleanly once the window is gone
+    server.should_exit = True
+    server_thread.join(timeout=SERVER_SHUTDOWN_TIMEOUT)
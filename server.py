@@ -1,13 +1,25 @@
+import asyncio
+import os
 import threading
 from contextlib import asynccontextmanager
+from typing import Tuple
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+from starlette.types import Scope
 
 from app.core.config import get_settings
-from app.dependencies import close_global_database
+from app.dependencies import (
+    close_global_database,
+    flush_global_database_periodically,
+    get_global_database,
+)
+from app.services.subscription_service import SubscriptionService
+from app.services.xray_update_service import GeodataUpdateService, XrayUpdateService
 from utils import get_app_root
 
 settings = get_settings()
@@ -16,7 +28,19 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan events (startup/shutdown)"""
+    # Load the database (which may probe for a system xray binary) before the
+    # first request, without blocking the event loop
+    await asyncio.to_thread(get_global_database)
+    # Services are shared across requests so their HTTP clients are reused
+    app.state.subscription_service = SubscriptionService()
+    app.state.xray_update_service = XrayUpdateService()
+    app.state.geodata_update_service = GeodataUpdateService()
+    flush_task = asyncio.create_task(flush_global_database_periodically())
     yield
+    flush_task.cancel()
+    await app.state.subscription_service.close()
+    await app.state.xray_update_service.close()
+    await app.state.geodata_update_service.close()
     close_global_database()
     from app.services.process_service import process_manager
 
@@ -28,6 +52,7 @@ app = FastAPI(
     description="FastAPI Proxy Subscription Manager with Xray-core",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS
@@ -59,7 +84,27 @@ include_routers(app)
 
 # Serve frontend
 UI_DIR = get_app_root() / "ui" / "dist"
-app.mount("/", StaticFiles(directory=UI_DIR, html=True), name="ui")
+
+# Vite puts content-hashed bundles under assets/, so they never change in place
+UI_ASSETS_PREFIX = "assets" + os.sep
+UI_ASSETS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class UIStaticFiles(StaticFiles):
+    """Static files for the UI, letting clients cache hashed bundles for good
+
+    Starlette already answers If-None-Match/If-Modified-Since with 304s; this
+    only lets the webview skip revalidating assets that cannot change.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if path.startswith(UI_ASSETS_PREFIX) and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = UI_ASSETS_CACHE_CONTROL
+        return response
+
+
+app.mount("/", UIStaticFiles(directory=UI_DIR, html=True), name="ui")
 
 
 def start_server():
@@ -67,10 +112,18 @@ def start_server():
     uvicorn.run(app, host=settings.api_host, port=settings.api_port)
 
 
-def start_server_thread():
-    """Start FastAPI in background thread"""
-    thread = threading.Thread(target=start_server, daemon=True)
+def start_server_thread() -> Tuple[uvicorn.Server, threading.Thread]:
+    """Start FastAPI in background thread
+
+    The server is returned so the caller can ask it to exit gracefully, which
+    runs the lifespan shutdown (stopping any running Xray process).
+    """
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=settings.api_host, port=settings.api_port)
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
     thread.start()
+    return server, thread
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+"""
+DatabaseManager tests
+"""
+
+import os
+import threading
+import unittest
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from uuid import uuid4
+
+from app.database.tinydb_manager import DatabaseManager
+from app.models.database import ServerModel, SubscriptionModel
+
+
+def make_server() -> ServerModel:
+    """Build a stopped server with a minimal config"""
+    return ServerModel(id=uuid4(), remarks="server", raw={}, status="stopped")
+
+
+class ServerIndexTests(unittest.TestCase):
+    """Server lookups must stay consistent with the stored subscriptions"""
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.temp_dir.name, "db.json"))
+
+    def tearDown(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def assert_not_indexed(self, subscription_id, server):
+        """Assert the server is unknown to every lookup"""
+        self.assertIsNone(self.db.get_server_location(server.id))
+        self.assertIsNone(self.db.get_server(subscription_id, server.id))
+        self.assertFalse(self.db.find_and_update_server_status(server.id, "running"))
+
+    def test_update_servers_of_unknown_subscription(self):
+        subscription_id = uuid4()
+        server = make_server()
+
+        self.assertIsNone(
+            self.db.update_subscription_servers(subscription_id, [server])
+        )
+        self.assert_not_indexed(subscription_id, server)
+
+    def test_refresh_finishing_after_delete(self):
+        subscription = SubscriptionModel(
+            id=uuid4(),
+            name="subscription",
+            url="https://example.com/sub",
+            servers=[make_server()],
+            last_updated=datetime.now(timezone.utc),
+        )
+        self.db.create_subscription(subscription)
+        self.db.delete_subscription(subscription.id)
+
+        server = make_server()
+        result = self.db.update_subscription_with_user_info(
+            subscription.id, [server], None
+        )
+
+        self.assertIsNone(result)
+        self.assert_not_indexed(subscription.id, server)
+
+
+class FlushTests(unittest.TestCase):
+    """flush() must persist changes without holding the manager lock on disk I/O"""
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "db.json")
+        self.db = DatabaseManager(self.db_path)
+
+    def tearDown(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def test_flush_writes_outside_manager_lock(self):
+        storage = self.db.db.storage.storage
+        write_bytes = storage.write_bytes
+        lock_held = []
+
+        def checking_write_bytes(content):
+            # Another thread can only take the lock if flush doesn't hold it
+            acquired = []
+
+            def try_lock():
+                if self.db._lock.acquire(timeout=1):
+                    self.db._lock.release()
+                    acquired.append(True)
+                else:
+                    acquired.append(False)
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            lock_held.append(not acquired[0])
+            write_bytes(content)
+
+        storage.write_bytes = checking_write_bytes
+        self.db.update_settings(
+            self.db.get_settings().model_copy(update={"socks_port": 1080})
+        )
+        self.db.flush()
+
+        self.assertEqual(lock_held, [False])
+        with open(self.db_path, "rb") as f:
+            self.assertIn(b'"socks_port":1080', f.read())
+
+        # Nothing pending, so a second flush doesn't write
+        self.db.flush()
+        self.assertEqual(lock_held, [False])
+
+
+if __name__ == "__main__":
+    unittest.main()
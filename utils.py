@@ -1,7 +1,9 @@
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 
+@lru_cache(maxsize=None)
 def get_app_root() -> Path:
     # In Nuitka --onefile, the bundled files live next to the executable
     if getattr(sys, "frozen", False):